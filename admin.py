@@ -0,0 +1,37 @@
+import hmac
+import os
+
+from flask import abort, jsonify, request
+
+from cpidata import INDICATORS, get_data, reload_data
+
+# Üres token esetén az admin végpontok ki vannak kapcsolva
+ADMIN_TOKEN = os.environ.get("CPI_ADMIN_TOKEN", "")
+
+
+def _check_token():
+    token = request.headers.get("X-Admin-Token", "")
+    if not ADMIN_TOKEN:
+        abort(404)
+    if not hmac.compare_digest(token, ADMIN_TOKEN):
+        abort(403)
+
+
+def register_admin_routes(server):
+    @server.route("/admin/reload-data", methods=["POST"])
+    def reload_data_route():
+        # Csak az ezt a kérést kiszolgáló workert tölti újra azonnal; a többi a
+        # fájl változását a következő ellenőrzéskor (CPI_RELOAD_CHECK_INTERVAL) veszi észre
+        _check_token()
+        indicator = request.args.get("indicator") or None
+        if indicator is not None and indicator not in INDICATORS:
+            abort(404)
+        previous = get_data(indicator)
+        data = reload_data(force=request.args.get("force") == "1", indicator=indicator)
+        return jsonify(
+            indicator=data.key,
+            previous_version=previous.version,
+            version=data.version,
+            reloaded=data is not previous,
+            load_report=data.load_report,
+        )
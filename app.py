@@ -1,33 +1,38 @@
-import pandas as pd
-import plotly.express as px
+# Elsőként, hogy a többi import ideje is mérhető legyen (startup.py)
+from startup import FAST_START, register_startup, startup_timer
+
+import os
+
 import plotly.graph_objects as go
+from plotly.colors import make_colorscale, sequential
 import dash
-from dash import dcc, html, Input, Output
+from dash import dcc, html, Input, Output, State, Patch, ClientsideFunction
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
+import dash_ag_grid as dag
 
-# Adatok betöltése
-df = pd.read_csv("CPI-historical.csv")
-all_years = sorted(df["Year"].unique())
-all_regions = sorted(df["Region"].dropna().unique())
-all_countries = sorted(df["Country / Territory"].dropna().unique())
-latest_year = max(all_years)
-min_year = min(all_years)
-
-region_names = {
-    "WE/EU": "Western Europe / European Union",
-    "AP": "Asia Pacific",
-    "AME": "Americas",
-    "SSA": "Sub-Saharan Africa",
-    "MENA": "Middle East & North Africa",
-    "ECA": "Eastern Europe & Central Asia",
-}
+from admin import register_admin_routes
+from cpidata import COUNTRY, INDICATORS, REGION_RANK, WORLD_RANK, extremes, get_data
+from dataapi import register_data_api
+from figcache import figure_cache, figure_key
+from geometry import apply_map_geometry, map_geometry, map_graph_config, register_geometry
+from gridquery import get_rows
+from httpcache import register_http_caching
+from jobs import background_callback, report
+from metrics import register_metrics
+from sequencing import INPUT_DEBOUNCE_MS, register_request_sequencing
+
+startup_timer.mark("framework")
+
+# Ennyi kiválasztott ország felett a line chart WebGL-lel (scattergl) rajzol
+LINE_WEBGL_MIN_COUNTRIES = int(os.environ.get("CPI_LINE_WEBGL_COUNTRIES", 30))
 
 color_scales = {
-    "Plasma": px.colors.sequential.Plasma,
-    "Viridis": px.colors.sequential.Viridis,
-    "Cividis": px.colors.sequential.Cividis,
-    "Turbo": px.colors.sequential.Turbo,
-    "Magma": px.colors.sequential.Magma,
+    "Plasma": sequential.Plasma,
+    "Viridis": sequential.Viridis,
+    "Cividis": sequential.Cividis,
+    "Turbo": sequential.Turbo,
+    "Magma": sequential.Magma,
 }
 
 
@@ -65,8 +70,7 @@ def kpi_box(label, value, color="#fff"):
     )
 
 
-def aggregate_kpi_panel(dff, view_name):
-    num_countries = dff["Country / Territory"].nunique()
+def aggregate_kpi_panel(num_countries, view_name):
     kpis = [
         kpi_box("View", view_name, color="#0af"),
         kpi_box("Countries", num_countries, color="#0ff"),
@@ -83,41 +87,23 @@ def aggregate_kpi_panel(dff, view_name):
     )
 
 
-def single_country_kpi_panel(country, year, df):
-    row = df[(df["Country / Territory"] == country) & (df["Year"] == year)]
+def single_country_kpi_panel(country, year, data):
+    row = data.country_year(country, year)
     if row.empty:
         return html.Div("No data for this selection.")
 
     row_data = row.iloc[0]
     region = row_data["Region"]
-    region_label = region_names.get(region, region)
+    region_label = data.region_names.get(region, region)
 
-    world_df = df[df["Year"] == year].sort_values(
-        "CPI score", ascending=False
-    )
-    world_rank = (
-        world_df.reset_index(drop=True)
-        .reset_index()
-        .set_index("Country / Territory")
-        .loc[country, "index"]
-        + 1
+    world_rank, world_total, region_rank, region_total = data.rank(
+        country, year
     )
-    world_total = world_df.shape[0]
-
-    region_df = world_df[world_df["Region"] == region]
-    region_rank = (
-        region_df.reset_index(drop=True)
-        .reset_index()
-        .set_index("Country / Territory")
-        .loc[country, "index"]
-        + 1
-    )
-    region_total = region_df.shape[0]
 
     kpis = [
         kpi_box("Country", country),
         kpi_box("Region", region_label, color="#0af"),
-        kpi_box("CPI score", row_data["CPI score"], color="#0ff"),
+        kpi_box(data.value, row_data[data.value], color="#0ff"),
         kpi_box("World rank", f"{world_rank} / {world_total}"),
         kpi_box("Region rank", f"{region_rank} / {region_total}"),
     ]
@@ -196,6 +182,32 @@ def color_scale_legend(scale_name):
     )
 
 
+# A helyezés oszlop mezőneve; nem ütközhet a mutató érték oszlopával (ami lehet "Rank" is)
+RANK_FIELD = "rank_pos"
+
+
+def ranking_column_defs(data):
+    return [
+        {"field": RANK_FIELD, "headerName": "Rank", "filter": "agNumberColumnFilter", "maxWidth": 120},
+        {"field": COUNTRY, "filter": "agTextColumnFilter"},
+        {"field": data.value, "filter": "agNumberColumnFilter", "maxWidth": 160},
+    ]
+
+
+def region_options(data):
+    return [{"label": "All regions", "value": "all"}] + [
+        {"label": data.region_names.get(r, r), "value": r} for r in data.regions
+    ]
+
+
+def year_marks(data):
+    return {str(year): str(year) for year in data.years if year % 5 == 0}
+
+
+def dashboard_title(data):
+    return f"{data.short_label} Time Series Dashboard {data.min_year}-{data.latest_year}"
+
+
 def get_line_color(selected_scale):
     scale = color_scales[selected_scale]
     idx = int(len(scale) * 0.7) if len(scale) > 4 else len(scale) // 2
@@ -208,211 +220,333 @@ app = dash.Dash(
     meta_tags=[
         {"name": "viewport", "content": "width=device-width, initial-scale=1.0"}
     ],
+    # A layout függvény validálása már az importkor betöltené az adatot; gyors
+    # indulásnál ezt kihagyjuk, a layout az első kéréskor (vagy háttérben) épül
+    suppress_callback_exceptions=FAST_START,
 )
 server = app.server
+register_admin_routes(server)
+register_data_api(server)
+register_geometry(server)
+register_metrics(server)
+register_request_sequencing(server)
+register_http_caching(server)
 
 
-app.layout = html.Div(
-    [
-        dbc.Container(
-            [
-                dbc.Row(
-                    [
-                        dbc.Col(
-                            html.H1(
-                                "CPI Time Series Dashboard 2012-2024",
-                                className="text-center text-light mb-4",
-                            ),
-                            width=12,
-                        )
-                    ]
-                ),
-                dbc.Row(
-                    [
-                        dbc.Col(
-                            html.Div(id="kpi-panel", style={"width": "100%"}),
-                            width=12,
-                        )
-                    ],
-                    className="mb-2",
-                ),
-                dbc.Row(
-                    [
-                        dbc.Col(
-                            [
-                                dbc.Label("Region", className="text-light"),
-                                dbc.Select(
-                                    id="region-select",
-                                    options=[
-                                        {"label": "All regions", "value": "all"}
-                                    ]
-                                    + [
-                                        {
-                                            "label": region_names.get(r, r),
-                                            "value": r,
-                                        }
-                                        for r in all_regions
-                                    ],
-                                    value="all",
-                                    className="bg-dark text-light",
-                                ),
-                            ],
-                            lg=4,
-                            md=6,
-                            xs=12,
-                            className="mb-2",
-                        ),
-                        dbc.Col(
-                            [
-                                dbc.Label("Country", className="text-light"),
-                                dcc.Dropdown(
-                                    id="country-select",
-                                    options=[
-                                        {"label": c, "value": c}
-                                        for c in all_countries
-                                    ],
-                                    value=[],
-                                    multi=True,
-                                ),
-                            ],
-                            lg=4,
-                            md=6,
-                            xs=12,
-                            className="mb-2",
-                        ),
-                        dbc.Col(
-                            [
-                                dbc.Label(
-                                    "Map color scale", className="text-light"
-                                ),
-                                dbc.Select(
-                                    id="color-scale-select",
-                                    options=[
-                                        {"label": k, "value": k}
-                                        for k in color_scales.keys()
-                                    ],
-                                    value="Plasma",
-                                    className="bg-dark text-light",
-                                ),
-                            ],
-                            lg=4,
-                            md=12,
-                            xs=12,
-                            className="mb-2",
-                        ),
-                    ],
-                    className="mb-3",
-                ),
-                dbc.Row(
-                    [
-                        dbc.Col(
-                            [
-                                dbc.Label("Select Year", className="text-light"),
-                                dcc.Slider(
-                                    id="year-slider",
-                                    min=min_year,
-                                    max=latest_year,
-                                    value=latest_year,
-                                    marks={
-                                        str(year): str(year)
-                                        for year in all_years
-                                        if year % 5 == 0
-                                    },
-                                    step=1,
-                                ),
-                            ],
-                            width=12,
-                        )
-                    ],
-                    className="mb-4",
-                ),
-                dbc.Row(
-                    [
-                        dbc.Col(
-                            [
-                                html.Div(id="color-legend-div"),
-                                dcc.Graph(
-                                    id="map-chart",
-                                    config={"displayModeBar": False},
-                                    style={"height": "550px"},
+# A layout függvény, így minden oldalbetöltés az aktuális adat-snapshotot látja
+def serve_layout():
+    data = get_data()
+    return html.Div(
+        [
+            dbc.Container(
+                [
+                    dbc.Row(
+                        [
+                            dbc.Col(
+                                html.H1(
+                                    dashboard_title(data),
+                                    id="dashboard-title",
+                                    className="text-center text-light mb-4",
                                 ),
-                            ],
-                            width=12,
-                        )
-                    ],
-                    className="mb-4",
-                ),
-                dbc.Row(
-                    [
-                        dbc.Col(
-                            [
-                                dbc.Tabs(
-                                    [
-                                        dbc.Tab(
-                                            label="Trend",
-                                            children=[
-                                                dcc.Graph(
-                                                    id="line-chart",
-                                                    config={
-                                                        "displayModeBar": False
-                                                    },
-                                                    style={"height": "550px"},
-                                                )
-                                            ],
-                                            tab_id="tab-trend",
-                                            label_style={"color": "#0cf"},
-                                        ),
-                                        # MÓDOSÍTÁS: Ranking fül tartalma
-                                        dbc.Tab(
-                                            label="Ranking",
-                                            children=[
-                                                dbc.RadioItems(
-                                                    id="ranking-mode-select",
-                                                    options=[
-                                                        {
-                                                            "label": "Top 10",
-                                                            "value": "Top 10",
-                                                        },
-                                                        {
-                                                            "label": "Bottom 10",
-                                                            "value": "Bottom 10",
+                                width=12,
+                            )
+                        ]
+                    ),
+                    # Mutatóválasztó; csak akkor látszik, ha több mutató van regisztrálva
+                    dbc.Row(
+                        [
+                            dbc.Col(
+                                [
+                                    dbc.Label("Indicator", className="text-light"),
+                                    dbc.Select(
+                                        id="indicator-select",
+                                        options=[
+                                            {"label": i.label, "value": key}
+                                            for key, i in INDICATORS.items()
+                                        ],
+                                        value=data.key,
+                                        className="bg-dark text-light",
+                                    ),
+                                ],
+                                lg=4,
+                                md=6,
+                                xs=12,
+                            )
+                        ],
+                        className="mb-2",
+                        style={} if len(INDICATORS) > 1 else {"display": "none"},
+                    ),
+                    dbc.Row(
+                        [
+                            dbc.Col(
+                                html.Div(id="kpi-panel", style={"width": "100%"}),
+                                width=12,
+                            )
+                        ],
+                        className="mb-2",
+                    ),
+                    dbc.Row(
+                        [
+                            dbc.Col(
+                                [
+                                    dbc.Label("Region", className="text-light"),
+                                    dbc.Select(
+                                        id="region-select",
+                                        options=region_options(data),
+                                        value="all",
+                                        className="bg-dark text-light",
+                                    ),
+                                ],
+                                lg=4,
+                                md=6,
+                                xs=12,
+                                className="mb-2",
+                            ),
+                            dbc.Col(
+                                [
+                                    dbc.Label("Country", className="text-light"),
+                                    dcc.Dropdown(
+                                        id="country-select",
+                                        options=[
+                                            {"label": c, "value": c}
+                                            for c in data.countries
+                                        ],
+                                        value=[],
+                                        multi=True,
+                                    ),
+                                ],
+                                lg=4,
+                                md=6,
+                                xs=12,
+                                className="mb-2",
+                            ),
+                            dbc.Col(
+                                [
+                                    dbc.Label(
+                                        "Map color scale", className="text-light"
+                                    ),
+                                    dbc.Select(
+                                        id="color-scale-select",
+                                        options=[
+                                            {"label": k, "value": k}
+                                            for k in color_scales.keys()
+                                        ],
+                                        value="Plasma",
+                                        className="bg-dark text-light",
+                                    ),
+                                ],
+                                lg=4,
+                                md=12,
+                                xs=12,
+                                className="mb-2",
+                            ),
+                        ],
+                        className="mb-3",
+                    ),
+                    dbc.Row(
+                        [
+                            dbc.Col(
+                                [
+                                    dbc.Label("Select Year", className="text-light"),
+                                    dcc.Slider(
+                                        id="year-slider",
+                                        min=data.min_year,
+                                        max=data.latest_year,
+                                        value=data.latest_year,
+                                        marks=year_marks(data),
+                                        step=1,
+                                    ),
+                                ],
+                                lg=11,
+                                xs=10,
+                            ),
+                            dbc.Col(
+                                [
+                                    dbc.Button(
+                                        "Play",
+                                        id="play-button",
+                                        color="info",
+                                        outline=True,
+                                        className="w-100",
+                                    ),
+                                    # Lejátszás: az összes év térképadata egyszer
+                                    # kerül a böngészőbe, a léptetés kliensoldali
+                                    dcc.Interval(
+                                        id="play-interval",
+                                        interval=800,
+                                        disabled=True,
+                                    ),
+                                    dcc.Store(id="map-year-data"),
+                                    dcc.Store(id="play-year"),
+                                    # A szerver callbackek a késleltetett évet figyelik
+                                    dcc.Store(id="year-value", data=data.latest_year),
+                                    dcc.Store(id="input-debounce", data=INPUT_DEBOUNCE_MS),
+                                ],
+                                lg=1,
+                                xs=2,
+                                className="d-flex align-items-end",
+                            ),
+                        ],
+                        className="mb-4",
+                    ),
+                    dbc.Row(
+                        [
+                            dbc.Col(
+                                [
+                                    html.Div(id="color-legend-div"),
+                                    dcc.Graph(
+                                        id="map-chart",
+                                        config=map_graph_config({"displayModeBar": False}),
+                                        style={"height": "550px"},
+                                    ),
+                                ],
+                                width=12,
+                            )
+                        ],
+                        className="mb-4",
+                    ),
+                    dbc.Row(
+                        [
+                            dbc.Col(
+                                [
+                                    dbc.Tabs(
+                                        id="dashboard-tabs",
+                                        active_tab="tab-trend",
+                                        children=[
+                                            dbc.Tab(
+                                                label="Trend",
+                                                children=[
+                                                    # Háttér callback folyamatjelző (jobs.py)
+                                                    dbc.Progress(
+                                                        id="line-progress",
+                                                        value=0,
+                                                        max=3,
+                                                        style={
+                                                            "height": "3px",
+                                                            "visibility": "hidden",
                                                         },
-                                                        {
-                                                            "label": "All",
-                                                            "value": "All",
+                                                    ),
+                                                    dcc.Graph(
+                                                        id="line-chart",
+                                                        config={
+                                                            "displayModeBar": False
                                                         },
-                                                    ],
-                                                    value="Top 10",
-                                                    inline=True,
-                                                    className="dbc d-flex justify-content-center my-3",
-                                                    inputClassName="btn-check",
-                                                    labelClassName="btn btn-outline-info",
-                                                ),
-                                                html.Div(
-                                                    id="ranking-grid-container",
-                                                    style={
-                                                        "height": "480px",
-                                                        "overflowY": "auto",
-                                                    },
-                                                ),
-                                            ],
-                                            tab_id="tab-ranking",
-                                            label_style={"color": "#0cf"},
-                                        ),
-                                    ]
-                                )
-                            ],
-                            width=12,
-                        )
-                    ],
-                ),
-            ],
-            fluid=True,
-            style={"backgroundColor": "#000", "padding": "20px"},
-        )
-    ],
-    style={"backgroundColor": "#000"},
+                                                        style={"height": "550px"},
+                                                    )
+                                                ],
+                                                tab_id="tab-trend",
+                                                label_style={"color": "#0cf"},
+                                            ),
+                                            # MÓDOSÍTÁS: Ranking fül tartalma
+                                            dbc.Tab(
+                                                label="Ranking",
+                                                children=[
+                                                    dbc.RadioItems(
+                                                        id="ranking-mode-select",
+                                                        options=[
+                                                            {
+                                                                "label": "Top 10",
+                                                                "value": "Top 10",
+                                                            },
+                                                            {
+                                                                "label": "Bottom 10",
+                                                                "value": "Bottom 10",
+                                                            },
+                                                            {
+                                                                "label": "All",
+                                                                "value": "All",
+                                                            },
+                                                        ],
+                                                        value="Top 10",
+                                                        inline=True,
+                                                        className="dbc d-flex justify-content-center my-3",
+                                                        inputClassName="btn-check",
+                                                        labelClassName="btn btn-outline-info",
+                                                    ),
+                                    html.Div(
+                                                        [
+                                                            html.H5(
+                                                                id="ranking-title",
+                                                                className="text-center text-light mt-2",
+                                                            ),
+                                                            # Infinite row model: a sorokat blokkonként
+                                                            # a szerver adja (get_ranking_rows)
+                                                            dag.AgGrid(
+                                                                id="ranking-grid",
+                                                                rowModelType="infinite",
+                                                                columnDefs=ranking_column_defs(data),
+                                                                defaultColDef={
+                                                                    "sortable": True,
+                                                                    "flex": 1,
+                                                                },
+                                                                dashGridOptions={
+                                                                    "rowBuffer": 0,
+                                                                    "cacheBlockSize": 50,
+                                                                    "maxBlocksInCache": 10,
+                                                                    "infiniteInitialRowCount": 1,
+                                                                },
+                                                                className="ag-theme-alpine-dark",
+                                                                style={"height": "430px"},
+                                                            ),
+                                                            dcc.Store(id="ranking-refresh"),
+                                                        ],
+                                                        id="ranking-grid-container",
+                                                        style={"height": "480px"},
+                                                    ),
+                                                ],
+                                                tab_id="tab-ranking",
+                                                label_style={"color": "#0cf"},
+                                            ),
+                                        ],
+                                    )
+                                ],
+                                width=12,
+                            )
+                        ],
+                    ),
+                ],
+                fluid=True,
+                style={"backgroundColor": "#000", "padding": "20px"},
+            )
+        ],
+        style={"backgroundColor": "#000"},
+    )
+
+
+app.layout = serve_layout
+register_startup(server, serve_layout)
+
+
+# Mutatóváltáskor a régiók, az évskála és a ranking oszlopai az új adatkészlethez igazodnak
+@app.callback(
+    Output("dashboard-title", "children"),
+    Output("region-select", "options"),
+    Output("region-select", "value"),
+    Output("year-slider", "min"),
+    Output("year-slider", "max"),
+    Output("year-slider", "marks"),
+    Output("year-slider", "value", allow_duplicate=True),
+    Output("year-value", "data", allow_duplicate=True),
+    Output("ranking-grid", "columnDefs"),
+    Input("indicator-select", "value"),
+    State("year-slider", "value"),
+    prevent_initial_call=True,
 )
+def update_indicator(indicator, selected_year):
+    data = get_data(indicator)
+    if selected_year not in data.years:
+        selected_year = data.latest_year
+    return (
+        dashboard_title(data),
+        region_options(data),
+        "all",
+        data.min_year,
+        data.latest_year,
+        year_marks(data),
+        selected_year,
+        selected_year,
+        ranking_column_defs(data),
+    )
 
 
 @app.callback(
@@ -420,262 +554,176 @@ app.layout = html.Div(
     Output("country-select", "value"),
     Input("region-select", "value"),
     Input("country-select", "value"),
+    Input("indicator-select", "value"),
 )
-def update_country_options(selected_region, current_countries):
+def update_country_options(selected_region, current_countries, indicator=None):
+    data = get_data(indicator)
     if selected_region == "all":
-        options = [{"label": c, "value": c} for c in all_countries]
-        value = current_countries
+        options = [{"label": c, "value": c} for c in data.countries]
+        value = [c for c in current_countries if c in data.country_region]
     else:
-        region_countries = sorted(
-            df[df["Region"] == selected_region]["Country / Territory"]
-            .dropna()
-            .unique()
-        )
+        region_countries = data.region_countries.get(selected_region, [])
         options = [{"label": c, "value": c} for c in region_countries]
         value = [c for c in current_countries if c in region_countries]
     return options, value
 
 
-@app.callback(
-    Output("map-chart", "figure"),
-    Output("line-chart", "figure"),
-    Output("color-legend-div", "children"),
-    Output("kpi-panel", "children"),
-    Output("ranking-grid-container", "children"),
-    Input("country-select", "value"),
-    Input("region-select", "value"),
-    Input("color-scale-select", "value"),
-    Input("ranking-mode-select", "value"),
-    Input("year-slider", "value"),
-)
-def update_dashboard(
-    selected_countries,
-    selected_region,
-    selected_scale,
-    ranking_mode,
-    selected_year,
-):
-    dff_full_year = df[df["Year"] == selected_year]
+def add_min_max_markers(line_fig, points):
+    # points: ((év, érték), (év, érték)) a cpidata.extremes / aggregate_extremes alakjában
+    if points is None:
+        return
+    (min_year, min_score), (max_year, max_score) = points
+    line_fig.add_trace(
+        go.Scatter(
+            x=[min_year],
+            y=[min_score],
+            mode="markers+text",
+            marker=dict(color="red", size=16, symbol="circle"),
+            text=["Min"],
+            textposition="bottom center",
+            showlegend=False,
+        )
+    )
+    line_fig.add_trace(
+        go.Scatter(
+            x=[max_year],
+            y=[max_score],
+            mode="markers+text",
+            marker=dict(color="lightgreen", size=16, symbol="circle"),
+            text=["Max"],
+            textposition="top center",
+            showlegend=False,
+        )
+    )
+
+
+def add_comparison_markers(line_fig, dff_line, value, webgl=False):
+    # Országonkénti min/max egyetlen groupby-jal, két közös marker trace-ben
+    scored = dff_line.dropna(subset=[value])
+    if scored.empty:
+        return
+    grouped = scored.groupby(COUNTRY, sort=False, observed=True)[value]
+    scatter = go.Scattergl if webgl else go.Scatter
+    for label, idx, color in (
+        ("Min", grouped.idxmin(), "red"),
+        ("Max", grouped.idxmax(), "lightgreen"),
+    ):
+        points = scored.loc[idx]
+        line_fig.add_trace(
+            scatter(
+                x=points["Year"],
+                y=points[value],
+                customdata=points[COUNTRY],
+                mode="markers",
+                marker=dict(color=color, size=14, symbol="circle"),
+                name=label,
+                hovertemplate=f"%{{customdata}}<br>{label}: %{{y}} (%{{x}})<extra></extra>",
+                showlegend=False,
+            )
+        )
 
-    # --- Ranking grid (táblázat) generálása ---
+
+def ranking_title(data, selected_region, ranking_mode, selected_year):
     if selected_region == "all":
-        dff_ranking_context = dff_full_year
         ranking_context_name = "World"
     else:
-        dff_ranking_context = dff_full_year[
-            dff_full_year["Region"] == selected_region
-        ]
-        ranking_context_name = region_names.get(selected_region)
+        ranking_context_name = data.region_names.get(selected_region, selected_region)
+    if ranking_mode == "Top 10":
+        return f"Top 10 Countries in {ranking_context_name} ({selected_year})"
+    if ranking_mode == "Bottom 10":
+        return f"Bottom 10 Countries in {ranking_context_name} ({selected_year})"
+    return f"All Countries in {ranking_context_name} ({selected_year})"
 
-    ranked_df = dff_ranking_context.copy()
-    ranked_df["Rank"] = (
-        ranked_df["CPI score"]
-        .rank(method="min", ascending=False)
-        .astype(int)
-    )
 
+def ranking_rows(data, selected_region, ranking_mode, selected_year):
+    ranked_df = data.year_region(selected_year, selected_region)
+
+    # A helyezések előre ki vannak számolva (cpidata), nem kell másolat
+    rank_column = WORLD_RANK if selected_region == "all" else REGION_RANK
+
+    # A "Top" a legjobb értékeket jelenti (ahol a kisebb a jobb, ott a legkisebbeket).
+    # Stabil rendezés: holtversenyben a CSV sorrendje dönt, nem az oszlop típusa.
+    best_first = not data.higher_is_better
     if ranking_mode == "Top 10":
         ranking_data = ranked_df.sort_values(
-            "CPI score", ascending=False
+            data.value, ascending=best_first, kind="stable"
         ).head(10)
-        title_text = (
-            f"Top 10 Countries in {ranking_context_name} ({selected_year})"
-        )
     elif ranking_mode == "Bottom 10":
-        ranking_data = ranked_df.sort_values("CPI score", ascending=True).head(
-            10
-        )
-        title_text = (
-            f"Bottom 10 Countries in {ranking_context_name} ({selected_year})"
-        )
+        ranking_data = ranked_df.sort_values(
+            data.value, ascending=not best_first, kind="stable"
+        ).head(10)
     else:  # "All" opció
-        ranking_data = ranked_df.sort_values("CPI score", ascending=False)
-        title_text = (
-            f"All Countries in {ranking_context_name} ({selected_year})"
+        ranking_data = ranked_df.sort_values(
+            data.value, ascending=best_first, kind="stable"
         )
 
-    display_df = ranking_data[["Rank", "Country / Territory", "CPI score"]]
-    ranking_grid = dbc.Table.from_dataframe(
-        display_df,
-        striped=True,
-        bordered=True,
-        hover=True,
-        color="dark",
-        responsive=True,
-    )
-    ranking_output = html.Div(
-        [html.H5(title_text, className="text-center text-light mt-2"), ranking_grid]
-    )
+    return ranking_data[
+        [rank_column, COUNTRY, data.value]
+    ].rename(columns={rank_column: RANK_FIELD})
 
-    # --- Térkép, vonaldiagram és KPI logika ---
-    line_fig = px.line(
-        title="Select country/countries to see trend"
-    ).update_layout(
-        template="plotly_dark",
-        plot_bgcolor="#111",
-        paper_bgcolor="#111",
+
+def build_kpi_panel(data, selected_countries, selected_region, selected_year):
+    if len(selected_countries) > 1:
+        dff_year = data.year(selected_year)
+        return aggregate_kpi_panel(
+            dff_year.loc[
+                dff_year["Country / Territory"].isin(selected_countries),
+                "Country / Territory",
+            ].nunique(),
+            "Custom Selection",
+        )
+    if len(selected_countries) == 1:
+        return single_country_kpi_panel(
+            selected_countries[0], selected_year, data
+        )
+    # Régió és világ: az országszám az aggregátum kockából (cpidata)
+    num_countries = data.aggregate_value(selected_region, selected_year, "count")
+    if selected_region == "all":
+        return aggregate_kpi_panel(num_countries or 0, "World")
+    return aggregate_kpi_panel(
+        num_countries or 0,
+        data.region_names.get(selected_region, selected_region),
     )
 
+
+def build_map_figure(
+    data, selected_countries, selected_region, selected_scale, selected_year
+):
+    # A Plotly Express (és vele a pandas) csak az első ábránál töltődik be
+    import plotly.express as px
+
+    dff_full_year = data.year(selected_year)
+    # A geometria az összes év országait tartalmazza, mert a lejátszás csak a locations-t cseréli
     if len(selected_countries) > 1:
         dff_map = dff_full_year[
             dff_full_year["Country / Territory"].isin(selected_countries)
         ]
-        map_title = "CPI: Multiple Countries Selected"
-        dff_line = df[df["Country / Territory"].isin(selected_countries)]
-        line_fig = px.line(
-            dff_line,
-            x="Year",
-            y="CPI score",
-            color="Country / Territory",
-            title="CPI Score Comparison",
-            markers=False,
-            line_shape="spline",
-        )
-        kpi_panel = aggregate_kpi_panel(dff_map, "Custom Selection")
-
-        for country in selected_countries:
-            country_df = dff_line[dff_line["Country / Territory"] == country]
-            if not country_df.empty:
-                min_row = country_df.loc[country_df["CPI score"].idxmin()]
-                max_row = country_df.loc[country_df["CPI score"].idxmax()]
-                line_fig.add_trace(
-                    go.Scatter(
-                        x=[min_row["Year"]],
-                        y=[min_row["CPI score"]],
-                        mode="markers",
-                        marker=dict(color="red", size=14, symbol="circle"),
-                        hoverinfo="skip",
-                        showlegend=False,
-                    )
-                )
-                line_fig.add_trace(
-                    go.Scatter(
-                        x=[max_row["Year"]],
-                        y=[max_row["CPI score"]],
-                        mode="markers",
-                        marker=dict(
-                            color="lightgreen", size=14, symbol="circle"
-                        ),
-                        hoverinfo="skip",
-                        showlegend=False,
-                    )
-                )
-
+        map_title = f"{data.short_label}: Multiple Countries Selected"
+        level, iso3 = "region", data.countries_df(selected_countries)["ISO3"]
     elif len(selected_countries) == 1:
         country = selected_countries[0]
-        dff_map = dff_full_year[dff_full_year["Country / Territory"] == country]
-        map_title = f"CPI: {country}"
-        dff_line = df[df["Country / Territory"] == country]
-        line_color = get_line_color(selected_scale)
-        line_fig = px.line(
-            dff_line,
-            x="Year",
-            y="CPI score",
-            title=f"CPI Score Over Time: {country}",
-            markers=False,
-            line_shape="spline",
-            color_discrete_sequence=line_color,
-        )
-        kpi_panel = single_country_kpi_panel(country, selected_year, df)
-
-        if not dff_line.empty:
-            min_score_row = dff_line.loc[dff_line["CPI score"].idxmin()]
-            max_score_row = dff_line.loc[dff_line["CPI score"].idxmax()]
-            line_fig.add_trace(
-                go.Scatter(
-                    x=[min_score_row["Year"]],
-                    y=[min_score_row["CPI score"]],
-                    mode="markers+text",
-                    marker=dict(color="red", size=16, symbol="circle"),
-                    text=["Min"],
-                    textposition="bottom center",
-                    showlegend=False,
-                )
-            )
-            line_fig.add_trace(
-                go.Scatter(
-                    x=[max_score_row["Year"]],
-                    y=[max_score_row["CPI score"]],
-                    mode="markers+text",
-                    marker=dict(
-                        color="lightgreen", size=16, symbol="circle"
-                    ),
-                    text=["Max"],
-                    textposition="top center",
-                    showlegend=False,
-                )
-            )
-
+        dff_map = data.country_year(country, selected_year)
+        map_title = f"{data.short_label}: {country}"
+        level, iso3 = "country", data.country(country)["ISO3"]
+    elif selected_region == "all":
+        dff_map = dff_full_year
+        map_title = f"{data.short_label}: World"
+        level, iso3 = "world", data.iso3_country
     else:
-        if selected_region == "all":
-            dff_map = dff_full_year
-            map_title = "CPI: World"
-            dff_line = (
-                df.groupby("Year").agg({"CPI score": "mean"}).reset_index()
-            )
-            line_title = "CPI Score Over Time: World Average"
-            kpi_panel = aggregate_kpi_panel(dff_map, "World")
-        else:
-            dff_map = dff_full_year[dff_full_year["Region"] == selected_region]
-            map_title = f"CPI: {region_names.get(selected_region)}"
-            dff_line = (
-                df[df["Region"] == selected_region]
-                .groupby("Year")
-                .agg({"CPI score": "mean"})
-                .reset_index()
-            )
-            line_title = f"CPI Score: {region_names.get(selected_region)} (average)"
-            kpi_panel = aggregate_kpi_panel(
-                dff_map, region_names.get(selected_region)
-            )
-
-        line_color = get_line_color(selected_scale)
-        line_fig = px.line(
-            dff_line,
-            x="Year",
-            y="CPI score",
-            title=line_title,
-            markers=False,
-            line_shape="spline",
-            color_discrete_sequence=line_color,
-        )
-
-        if not dff_line.empty:
-            min_score_row = dff_line.loc[dff_line["CPI score"].idxmin()]
-            max_score_row = dff_line.loc[dff_line["CPI score"].idxmax()]
-            line_fig.add_trace(
-                go.Scatter(
-                    x=[min_score_row["Year"]],
-                    y=[min_score_row["CPI score"]],
-                    mode="markers+text",
-                    marker=dict(color="red", size=16, symbol="circle"),
-                    text=["Min"],
-                    textposition="bottom center",
-                    showlegend=False,
-                )
-            )
-            line_fig.add_trace(
-                go.Scatter(
-                    x=[max_score_row["Year"]],
-                    y=[max_score_row["CPI score"]],
-                    mode="markers+text",
-                    marker=dict(
-                        color="lightgreen", size=16, symbol="circle"
-                    ),
-                    text=["Max"],
-                    textposition="top center",
-                    showlegend=False,
-                )
-            )
+        dff_map = data.year_region(selected_year, selected_region)
+        map_title = f"{data.short_label}: {data.region_names.get(selected_region, selected_region)}"
+        level, iso3 = "region", data.region(selected_region)["ISO3"]
+    geometry = map_geometry(level, iso3)
 
     map_fig = px.choropleth(
         dff_map,
         locations="ISO3",
-        color="CPI score",
-        hover_name="Country / Territory",
+        color=data.value,
+        hover_name=COUNTRY,
         color_continuous_scale=color_scales[selected_scale],
-        range_color=(df["CPI score"].min(), df["CPI score"].max()),
+        range_color=data.score_range,
         title=map_title,
+        **geometry,
     )
     map_fig.update_geos(
         showcoastlines=False,
@@ -684,6 +732,7 @@ def update_dashboard(
         showcountries=False,
         showframe=False,
     )
+    apply_map_geometry(map_fig, geometry, level)
     map_fig.update_layout(
         template="plotly_dark",
         plot_bgcolor="#000",
@@ -702,6 +751,54 @@ def update_dashboard(
         xref="paper",
         yref="paper",
     )
+    return map_fig
+
+
+def build_line_figure(data, selected_countries, selected_region, selected_scale):
+    import plotly.express as px
+
+    if len(selected_countries) > 1:
+        dff_line = data.countries_df(selected_countries)
+        webgl = len(selected_countries) >= LINE_WEBGL_MIN_COUNTRIES
+        line_fig = px.line(
+            dff_line,
+            x="Year",
+            y=data.value,
+            color=COUNTRY,
+            title=f"{data.label} Comparison",
+            markers=False,
+            # A scattergl nem ismeri a spline vonalat
+            line_shape="linear" if webgl else "spline",
+            render_mode="webgl" if webgl else "auto",
+        )
+
+        add_comparison_markers(line_fig, dff_line, data.value, webgl)
+
+    else:
+        if len(selected_countries) == 1:
+            country = selected_countries[0]
+            dff_line = data.country(country)
+            points = extremes(dff_line, data.value)
+            line_title = f"{data.label} Over Time: {country}"
+        elif selected_region == "all":
+            dff_line = data.aggregate_series("all")
+            points = data.aggregate_extremes("all")
+            line_title = f"{data.label} Over Time: World Average"
+        else:
+            dff_line = data.aggregate_series(selected_region)
+            points = data.aggregate_extremes(selected_region)
+            line_title = f"{data.label}: {data.region_names.get(selected_region, selected_region)} (average)"
+
+        line_fig = px.line(
+            dff_line,
+            x="Year",
+            y=data.value,
+            title=line_title,
+            markers=False,
+            line_shape="spline",
+            color_discrete_sequence=get_line_color(selected_scale),
+        )
+        add_min_max_markers(line_fig, points)
 
     line_fig.update_traces(line=dict(width=2))
     line_fig.update_layout(
@@ -711,11 +808,265 @@ def update_dashboard(
         font_color="#fff",
         margin=dict(l=10, r=10, t=40, b=10),
     )
+    return line_fig
+
+
+# --- Callbackek: minden kimenet csak a saját bemeneteire számolódik újra ---
+# Az év váltását a kliensoldali callback kezeli (assets/playback.js)
+@app.callback(
+    Output("map-chart", "figure"),
+    Input("country-select", "value"),
+    Input("region-select", "value"),
+    State("year-slider", "value"),
+    State("color-scale-select", "value"),
+    Input("indicator-select", "value"),
+)
+def update_map(
+    selected_countries, selected_region, selected_year, selected_scale, indicator=None
+):
+    data = get_data(indicator)
+    return figure_cache.get(
+        figure_key(
+            "app-map",
+            selected_countries,
+            selected_region,
+            selected_scale,
+            selected_year,
+        ),
+        lambda: build_map_figure(
+            data,
+            selected_countries,
+            selected_region,
+            selected_scale,
+            selected_year,
+        ),
+        version=data.version,
+    )
+
+
+def build_map_year_data(data, selected_countries, selected_region):
+    if selected_countries:
+        dff = data.countries_df(selected_countries)
+    else:
+        dff = data.region(selected_region)
+    frames = {
+        str(year): {
+            "locations": group["ISO3"].tolist(),
+            "z": group[data.value].tolist(),
+            "hovertext": group[COUNTRY].tolist(),
+        }
+        for year, group in dff.groupby("Year")
+    }
+    return {"years": data.years, "frames": frames}
+
+
+@app.callback(
+    Output("map-year-data", "data"),
+    Input("country-select", "value"),
+    Input("region-select", "value"),
+    Input("indicator-select", "value"),
+)
+def update_map_year_data(selected_countries, selected_region, indicator=None):
+    return build_map_year_data(
+        get_data(indicator), selected_countries, selected_region
+    )
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace="playback", function_name="render_year"),
+    Output("map-chart", "figure", allow_duplicate=True),
+    Input("year-slider", "value"),
+    Input("play-year", "data"),
+    State("map-year-data", "data"),
+    State("map-chart", "figure"),
+    prevent_initial_call=True,
+)
+
+# A csúszka gyors léptetésénél (billentyűzet, egymás utáni kattintások) csak a megállás
+# utáni év megy a szerverre (assets/debounce.js); a térkép a csúszkát azonnal követi
+app.clientside_callback(
+    ClientsideFunction(namespace="inputs", function_name="year"),
+    Output("year-value", "data"),
+    Input("year-slider", "value"),
+    State("input-debounce", "data"),
+    State("year-value", "data"),
+    prevent_initial_call=True,
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace="playback", function_name="toggle"),
+    Output("play-interval", "disabled"),
+    Output("play-button", "children"),
+    Output("year-slider", "value"),
+    Output("play-year", "data", allow_duplicate=True),
+    Input("play-button", "n_clicks"),
+    State("play-interval", "disabled"),
+    State("play-year", "data"),
+    prevent_initial_call=True,
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace="playback", function_name="advance"),
+    Output("play-year", "data"),
+    Input("play-interval", "n_intervals"),
+    State("play-year", "data"),
+    State("year-slider", "value"),
+    State("map-year-data", "data"),
+    prevent_initial_call=True,
+)
+
+
+# Sok ország összehasonlítása lassú lehet: háttér jobként fut, ha van job manager (jobs.py)
+@background_callback(
+    app,
+    Output("line-chart", "figure"),
+    Input("country-select", "value"),
+    Input("region-select", "value"),
+    State("color-scale-select", "value"),
+    Input("indicator-select", "value"),
+    progress=[Output("line-progress", "value"), Output("line-progress", "max")],
+    running=[
+        (
+            Output("line-progress", "style"),
+            {"height": "3px", "visibility": "visible"},
+            {"height": "3px", "visibility": "hidden"},
+        )
+    ],
+)
+def update_line_chart(
+    selected_countries,
+    selected_region,
+    selected_scale,
+    indicator=None,
+    set_progress=None,
+):
+    data = get_data(indicator)
+    report(set_progress, 1, 3)
+
+    def build():
+        line_fig = build_line_figure(
+            data, selected_countries, selected_region, selected_scale
+        )
+        report(set_progress, 2, 3)
+        return line_fig
+
+    line_fig = figure_cache.get(
+        figure_key(
+            "app-line", selected_countries, selected_region, selected_scale
+        ),
+        build,
+        version=data.version,
+    )
+    report(set_progress, 3, 3)
+    return line_fig
+
+
+# Színskála váltásnál csak a meglévő ábrák színeit frissítjük (Patch)
+@app.callback(
+    Output("map-chart", "figure", allow_duplicate=True),
+    Input("color-scale-select", "value"),
+    prevent_initial_call=True,
+)
+def update_map_color_scale(selected_scale):
+    patched_fig = Patch()
+    patched_fig["layout"]["coloraxis"]["colorscale"] = make_colorscale(
+        color_scales[selected_scale]
+    )
+    return patched_fig
+
+
+@app.callback(
+    Output("line-chart", "figure", allow_duplicate=True),
+    Input("color-scale-select", "value"),
+    State("country-select", "value"),
+    prevent_initial_call=True,
+)
+def update_line_color(selected_scale, selected_countries):
+    # Több ország összehasonlításánál a vonalszínek nem a skálából jönnek
+    if len(selected_countries) > 1:
+        return dash.no_update
+    patched_fig = Patch()
+    patched_fig["data"][0]["line"]["color"] = get_line_color(selected_scale)[0]
+    return patched_fig
+
+
+@app.callback(
+    Output("color-legend-div", "children"),
+    Input("color-scale-select", "value"),
+)
+def update_color_legend(selected_scale):
+    return color_scale_legend(selected_scale)
+
+
+@app.callback(
+    Output("kpi-panel", "children"),
+    Input("country-select", "value"),
+    Input("region-select", "value"),
+    Input("year-value", "data"),
+    Input("indicator-select", "value"),
+)
+def update_kpi_panel(
+    selected_countries, selected_region, selected_year, indicator=None
+):
+    return build_kpi_panel(
+        get_data(indicator), selected_countries, selected_region, selected_year
+    )
+
 
-    legend = color_scale_legend(selected_scale)
+# A ranking táblázat csak aktív fülnél kér adatot a szervertől
+@app.callback(
+    Output("ranking-title", "children"),
+    Input("region-select", "value"),
+    Input("ranking-mode-select", "value"),
+    Input("year-value", "data"),
+    Input("dashboard-tabs", "active_tab"),
+    Input("indicator-select", "value"),
+)
+def update_ranking_title(
+    selected_region, ranking_mode, selected_year, active_tab, indicator=None
+):
+    if active_tab != "tab-ranking":
+        raise PreventUpdate
+    return ranking_title(
+        get_data(indicator), selected_region, ranking_mode, selected_year
+    )
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace="ranking", function_name="refresh"),
+    Output("ranking-refresh", "data"),
+    Input("region-select", "value"),
+    Input("ranking-mode-select", "value"),
+    Input("year-value", "data"),
+    Input("dashboard-tabs", "active_tab"),
+    Input("indicator-select", "value"),
+    prevent_initial_call=True,
+)
+
+
+@app.callback(
+    Output("ranking-grid", "getRowsResponse"),
+    Input("ranking-grid", "getRowsRequest"),
+    State("region-select", "value"),
+    State("ranking-mode-select", "value"),
+    State("year-value", "data"),
+    State("dashboard-tabs", "active_tab"),
+    State("indicator-select", "value"),
+)
+def get_ranking_rows(
+    request, selected_region, ranking_mode, selected_year, active_tab, indicator=None
+):
+    if request is None or active_tab != "tab-ranking":
+        raise PreventUpdate
+    return get_rows(
+        ranking_rows(
+            get_data(indicator), selected_region, ranking_mode, selected_year
+        ),
+        request,
+    )
 
-    return map_fig, line_fig, legend, kpi_panel, ranking_output
 
+startup_timer.mark("app")
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -1,9 +1,11 @@
 from dash import Dash, dcc
 import dash_ag_grid as dag
 import plotly.express as px
-import pandas as pd
 
-df = pd.read_csv("https://raw.githubusercontent.com/plotly/Figure-Friday/refs/heads/main/2025/week-28/CPI2024.csv")
+from datasource import load_snapshot
+
+# Helyi snapshot (frissítés: python datasource.py refresh)
+df = load_snapshot()
 
 fig = px.choropleth(df, color="Rank", locations="ISO3", hover_name="Country / Territory",
                     title="Ranking of Corruption Perceptions Index 2024")
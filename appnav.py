@@ -1,28 +1,30 @@
-import pandas as pd
-import plotly.express as px
+# Elsőként, hogy a többi import ideje is mérhető legyen (startup.py)
+from startup import register_startup, startup_timer
+
+from plotly.colors import sequential
 import dash
-from dash import dcc, html, Input, Output, State
+from dash import dcc, html, Input, Output, State, ClientsideFunction
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 
-# --- Adatok és alapbeállítások ---
-df = pd.read_csv("CPI-historical.csv")
-all_years = sorted(df["Year"].unique())
-all_regions = sorted(df["Region"].dropna().unique())
-all_countries = sorted(df["Country / Territory"].dropna().unique())
-latest_year = max(all_years)
-
-region_names = {
-    "WE/EU": "Western Europe / European Union", "AP": "Asia Pacific",
-    "AME": "Americas", "SSA": "Sub-Saharan Africa",
-    "MENA": "Middle East & North Africa", "ECA": "Eastern Europe & Central Asia"
-}
+from admin import register_admin_routes
+from cpidata import COUNTRY, DEFAULT_INDICATOR, INDICATORS, get_data
+from dataapi import register_data_api
+from figcache import figure_cache, figure_key
+from geometry import apply_map_geometry, map_geometry, map_graph_config, register_geometry
+from httpcache import register_http_caching
+from jobs import background_callback, report
+from metrics import register_metrics
+from sequencing import INPUT_DEBOUNCE_MS, register_request_sequencing
+
+startup_timer.mark("framework")
+
+# --- Alapbeállítások (az adatokat minden callback a kiválasztott mutató get_data() snapshotjából olvassa) ---
 color_scales = {
-    "Plasma": px.colors.sequential.Plasma, "Viridis": px.colors.sequential.Viridis,
-    "Cividis": px.colors.sequential.Cividis, "Turbo": px.colors.sequential.Turbo,
-    "Magma": px.colors.sequential.Magma
+    "Plasma": sequential.Plasma, "Viridis": sequential.Viridis,
+    "Cividis": sequential.Cividis, "Turbo": sequential.Turbo,
+    "Magma": sequential.Magma
 }
-KPI_FIELDS = ["Country / Territory", "CPI score"]
-
 # --- Segédfüggvények ---
 def kpi_box(label, value, color="#fff"):
     return html.Div([
@@ -34,25 +36,21 @@ def kpi_box(label, value, color="#fff"):
         "boxShadow": "0 2px 8px #0002", "textAlign": "center",
     })
 
-def kpi_panel_row(country, year, df, region=None):
-    row = df[(df["Country / Territory"] == country) & (df["Year"] == year)]
+def kpi_panel_row(country, year, data, region=None):
+    row = data.country_year(country, year)
     kpis = []
-    region_label = region_names.get(region, region) if region else "-"
+    region_label = data.region_names.get(region, region) if region else "-"
+    kpi_fields = [COUNTRY, data.value]
     kpis.append(kpi_box("Region", region_label, color="#0af"))
     if row.empty:
-        for field in KPI_FIELDS: kpis.append(kpi_box(field, "-"))
+        for field in kpi_fields: kpis.append(kpi_box(field, "-"))
         kpis.append(kpi_box("World rank", "-")); kpis.append(kpi_box("Region rank", "-"))
     else:
         row = row.iloc[0]; region = row["Region"]
-        world_df = df[df["Year"] == year].sort_values("CPI score", ascending=False)
-        world_rank = world_df.reset_index(drop=True).reset_index().set_index("Country / Territory").loc[country, "index"] + 1
-        world_total = world_df.shape[0]
-        region_df = world_df[world_df["Region"] == region]
-        region_rank = region_df.reset_index(drop=True).reset_index().set_index("Country / Territory").loc[country, "index"] + 1
-        region_total = region_df.shape[0]
-        for field in KPI_FIELDS:
+        world_rank, world_total, region_rank, region_total = data.rank(country, year)
+        for field in kpi_fields:
             val = row[field] if field in row else "-"
-            if field == "CPI score": kpis.append(kpi_box(field, val, color="#0ff"))
+            if field == data.value: kpis.append(kpi_box(field, val, color="#0ff"))
             else: kpis.append(kpi_box(field, val))
         kpis.append(kpi_box("World rank", f"{world_rank} / {world_total}"))
         kpis.append(kpi_box("Region rank", f"{region_rank} / {region_total}"))
@@ -72,36 +70,71 @@ def get_line_color(selected_scale):
     idx = int(len(scale) * 0.7) if len(scale) > 4 else len(scale) // 2
     return [scale[idx]]
 
-def create_ranking_barchart(dff, region, selected_scale, year):
-    title_text = f"CPI {year} Ranking: {region_names.get(region, region) if region else 'World'}"
-    chart_df = dff.sort_values("CPI score", ascending=True)
-    fig = px.bar(chart_df, x="CPI score", y="Country / Territory", orientation='h', title=title_text, color="CPI score", color_continuous_scale=color_scales[selected_scale], range_color=(df["CPI score"].min(), df["CPI score"].max()), text="CPI score")
-    fig.update_layout(template="plotly_dark", plot_bgcolor="#111", paper_bgcolor="#111", font_color="#fff", margin=dict(l=10, r=10, t=40, b=10), yaxis_title=None, xaxis_title="CPI Score", coloraxis_showscale=False, height=max(600, len(chart_df) * 25))
+# A Plotly Express (és vele a pandas) csak az első ábránál töltődik be
+def create_ranking_barchart(dff, region, selected_scale, year, data):
+    import plotly.express as px
+    title_text = f"{data.short_label} {year} Ranking: {data.region_names.get(region, region) if region else 'World'}"
+    # A legjobb ország kerül felülre
+    chart_df = dff.sort_values(data.value, ascending=data.higher_is_better, kind="stable")
+    fig = px.bar(chart_df, x=data.value, y=COUNTRY, orientation='h', title=title_text, color=data.value, color_continuous_scale=color_scales[selected_scale], range_color=data.score_range, text=data.value)
+    fig.update_layout(template="plotly_dark", plot_bgcolor="#111", paper_bgcolor="#111", font_color="#fff", margin=dict(l=10, r=10, t=40, b=10), yaxis_title=None, xaxis_title=data.label, coloraxis_showscale=False, height=max(600, len(chart_df) * 25))
     fig.update_traces(textposition='outside')
-    return dcc.Graph(figure=fig, config={"displayModeBar": False})
+    return fig
+
+def build_map_figure(dff_map, map_title, selected_scale, data, level="world"):
+    import plotly.express as px
+    # Csak a térképen látható országok geometriája töltődik le, a nagyításnak megfelelő szinten
+    geometry = map_geometry(level, dff_map["ISO3"])
+    map_fig = px.choropleth(dff_map, locations="ISO3", color=data.value, hover_name=COUNTRY, color_continuous_scale=color_scales[selected_scale], range_color=data.score_range, title=map_title, **geometry)
+    map_fig.update_geos(showcoastlines=False, showland=True, fitbounds="locations", showcountries=False, showframe=False)
+    apply_map_geometry(map_fig, geometry, level)
+    map_fig.update_layout(template="plotly_dark", plot_bgcolor="#000", paper_bgcolor="#000", font_color="#fff", margin=dict(l=10, r=10, t=40, b=10), coloraxis_showscale=False)
+    return map_fig
+
+def build_line_figure(country, region_context, selected_scale, data):
+    import plotly.express as px
+    line_color = get_line_color(selected_scale)
+    if country != "all":
+        dff_line = data.country(country)
+        title = f"{data.label} Over Time: {country}"
+    elif region_context:
+        dff_line = data.aggregate_series(region_context)
+        title = f"{data.label}: {data.region_names.get(region_context, region_context)} (average)"
+    else:
+        dff_line = data.aggregate_series("all")
+        title = f"{data.label} Over Time: World Average"
+    line_fig = px.line(dff_line, x="Year", y=data.value, markers=True, title=title, line_shape="spline", color_discrete_sequence=line_color)
+    line_fig.update_traces(line=dict(width=4))
+    line_fig.update_layout(template="plotly_dark", plot_bgcolor="#111", paper_bgcolor="#111", font_color="#fff", margin=dict(l=10, r=10, t=40, b=10))
+    return line_fig
 
 # --- Layout függvény a fő dashboardnak ---
-def create_dashboard_layout():
+def region_options(data, all_label):
+    return [{"label": all_label, "value": "all"}] + [{"label": data.region_names.get(r, r), "value": r} for r in data.regions]
+
+def create_dashboard_layout(indicator=None):
+    data = get_data(indicator)
     return dbc.Container([
-        dbc.Row([dbc.Col(html.H1("CPI Time Series Dashboard", className="text-center text-light mb-4"), width=12)]),
+        dbc.Row([dbc.Col(html.H1(f"{data.short_label} Time Series Dashboard", id="dashboard-title", className="text-center text-light mb-4"), width=12)]),
         dbc.Row([dbc.Col(html.Div(id="kpi-panel", style={"width": "100%"}), width=12)], className="mb-2"),
         dbc.Row([
-            dbc.Col([dbc.Label("Region", className="text-light"), dbc.Select(id="region-select", options=[{"label": "All regions", "value": "all"}] + [{"label": region_names.get(r, r), "value": r} for r in all_regions], value="all", className="bg-dark text-light")], lg=4, md=6, xs=12, className="mb-2"),
-            dbc.Col([dbc.Label("Country", className="text-light"), dbc.Select(id="country-select", options=[{"label": "All countries", "value": "all"}] + [{"label": c, "value": c} for c in all_countries], value="all", className="bg-dark text-light")], lg=4, md=6, xs=12, className="mb-2"),
+            dbc.Col([dbc.Label("Region", className="text-light"), dbc.Select(id="region-select", options=region_options(data, "All regions"), value="all", className="bg-dark text-light")], lg=4, md=6, xs=12, className="mb-2"),
+            dbc.Col([dbc.Label("Country", className="text-light"), dbc.Select(id="country-select", options=[{"label": "All countries", "value": "all"}] + [{"label": c, "value": c} for c in data.countries], value="all", className="bg-dark text-light")], lg=4, md=6, xs=12, className="mb-2"),
             dbc.Col([dbc.Label("Map color scale", className="text-light"), dbc.RadioItems(id="color-scale-select", options=[{"label": k, "value": k} for k in color_scales.keys()], value="Plasma", inline=True, className="text-light")], lg=4, md=12, xs=12, className="mb-2"),
         ], className="mb-3"),
         dbc.Row([
-            dbc.Col([html.Div(id="color-legend-div"), dcc.Graph(id="map-chart", config={"displayModeBar": False}, style={"height": "550px"})], lg=7, xs=12),
+            dbc.Col([html.Div(id="color-legend-div"), dcc.Graph(id="map-chart", config=map_graph_config({"displayModeBar": False}), style={"height": "550px"})], lg=7, xs=12),
             dbc.Col([dcc.Graph(id="line-chart", config={"displayModeBar": False}, style={"height": "550px"})], lg=5, xs=12, className="mt-4 mt-lg-0"),
         ], align="start", justify="between"),
     ], fluid=True, style={"padding": "20px"})
 
 # --- Layout függvény a ranking oldalnak ---
-def create_ranking_layout():
+def create_ranking_layout(indicator=None):
+    data = get_data(indicator)
     return dbc.Container([
         dbc.Row([dbc.Col(html.H1("Country Rankings", className="text-center text-light mb-4"), width=12)]),
         dbc.Row([
-            dbc.Col([dbc.Label("Region", className="text-light"), dbc.Select(id="ranking-region-select", options=[{"label": "World", "value": "all"}] + [{"label": region_names.get(r, r), "value": r} for r in all_regions], value="all", className="bg-dark text-light")], lg=4, md=12, className="mb-3"),
+            dbc.Col([dbc.Label("Region", className="text-light"), dbc.Select(id="ranking-region-select", options=region_options(data, "World"), value="all", className="bg-dark text-light")], lg=4, md=12, className="mb-3"),
             dbc.Col([dbc.Label("Color scale", className="text-light"), dbc.RadioItems(id="ranking-color-scale-select", options=[{"label": k, "value": k} for k in color_scales.keys()], value="Plasma", inline=True, className="text-light")], lg=8, md=12, className="mb-3"),
         ], justify="center"),
         dbc.Row([
@@ -113,17 +146,32 @@ def create_ranking_layout():
             ], lg=4, md=6, className="mb-3"),
             dbc.Col([
                 dbc.Label("Number of countries", className="text-light"),
-                dbc.Input(id="ranking-n-input", type="number", min=5, max=50, step=5, value=10, disabled=True)
+                dbc.Input(id="ranking-n-input", type="number", min=5, max=50, step=5, value=10, disabled=True, debounce=INPUT_DEBOUNCE_MS)
             ], lg=3, md=6, className="mb-3"),
         ], justify="center", className="mb-4"),
-        dbc.Row([dbc.Col(html.Div(id="ranking-chart-div"), width=12)])
+        dbc.Row([dbc.Col([
+            dbc.Progress(id="ranking-progress", value=0, max=3, style={"height": "3px", "visibility": "hidden"}),
+            html.Div(id="ranking-chart-div"),
+        ], width=12)])
     ], fluid=True, style={"padding": "20px"})
 
+# --- Oldalak: útvonal -> (konténer id, layout függvény) ---
+PAGES = {
+    "/": ("page-dashboard", create_dashboard_layout),
+    "/ranking": ("page-ranking", create_ranking_layout),
+}
+
 # --- App inicializálása a többoldalas működéshez szükséges beállítással ---
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.DARKLY],
                 meta_tags=[{"name": "viewport", "content": "width=device-width, initial-scale=1.0"}],
                 suppress_callback_exceptions=True)
 server = app.server
+register_admin_routes(server)
+register_data_api(server)
+register_geometry(server)
+register_metrics(server)
+register_request_sequencing(server)
+register_http_caching(server)
 
 # --- Fő elrendezés navigációval és tartalom konténerrel ---
 app.layout = html.Div([
@@ -132,6 +180,12 @@ app.layout = html.Div([
         children=[
             dbc.NavItem(dbc.NavLink("Dashboard", href="/")),
             dbc.NavItem(dbc.NavLink("Ranking", href="/ranking")),
+            # Mutatóválasztó; csak akkor látszik, ha több mutató van regisztrálva
+            dbc.NavItem(
+                dbc.Select(id="indicator-select", options=[{"label": i.label, "value": key} for key, i in INDICATORS.items()],
+                           value=DEFAULT_INDICATOR, size="sm", className="bg-dark text-light ms-3"),
+                style={} if len(INDICATORS) > 1 else {"display": "none"},
+            ),
         ],
         brand="CPI Explorer",
         brand_href="/",
@@ -139,16 +193,77 @@ app.layout = html.Div([
         dark=True,
         className="mb-3"
     ),
-    html.Div(id="page-content", style={"backgroundColor": "#000"})
+    html.Div(
+        [html.Div(id=container, style={"display": "none"}) for container, _ in PAGES.values()],
+        id="page-content",
+        style={"backgroundColor": "#000"},
+    ),
+    # A már felcsatolt oldalak útvonalai
+    dcc.Store(id="mounted-pages", data=[]),
 ])
 
-# --- Router callback, ami betölti a megfelelő oldalt ---
-@app.callback(Output("page-content", "children"), Input("url", "pathname"))
-def display_page(pathname):
-    if pathname == "/ranking":
-        return create_ranking_layout()
-    else:
-        return create_dashboard_layout()
+# --- Router: minden oldal az első látogatáskor egyszer csatolódik fel, utána csak elrejtjük ---
+# Így navigáláskor megmarad az oldalak állapota, és nem fut újra egyetlen callback sem.
+def page_path(pathname):
+    return pathname if pathname in PAGES else "/"
+
+
+_page_layouts = {}
+
+
+def page_layout(path, indicator=None):
+    # Oldalanként egyszer épül fel mutatónként és adatverziónként
+    data = get_data(indicator)
+    key = (path, data.key)
+    cached = _page_layouts.get(key)
+    if cached is None or cached[0] != data.version:
+        cached = _page_layouts[key] = (data.version, PAGES[path][1](data.key))
+    return cached[1]
+
+
+register_startup(server, lambda: page_layout("/"))
+
+
+@app.callback(
+    [Output(container, "children") for container, _ in PAGES.values()],
+    Output("mounted-pages", "data"),
+    Input("url", "pathname"),
+    State("mounted-pages", "data"),
+    State("indicator-select", "value"),
+)
+def display_page(pathname, mounted_pages, indicator=None):
+    path = page_path(pathname)
+    mounted_pages = mounted_pages or []
+    if path in mounted_pages:
+        raise PreventUpdate
+    children = [page_layout(p, indicator) if p == path else dash.no_update for p in PAGES]
+    return children + [mounted_pages + [path]]
+
+
+# Az oldalak láthatósága kliensoldalon vált (assets/router.js)
+app.clientside_callback(
+    ClientsideFunction(namespace="router", function_name="show"),
+    [Output(container, "style") for container, _ in PAGES.values()],
+    Input("url", "pathname"),
+)
+
+# --- Mutatóváltás: a már felcsatolt oldalak régiólistája az új adatkészlethez igazodik ---
+@app.callback(
+    Output("dashboard-title", "children"), Output("region-select", "options"), Output("region-select", "value"),
+    Input("indicator-select", "value"),
+    prevent_initial_call=True,
+)
+def update_dashboard_indicator(indicator):
+    data = get_data(indicator)
+    return f"{data.short_label} Time Series Dashboard", region_options(data, "All regions"), "all"
+
+@app.callback(
+    Output("ranking-region-select", "options"), Output("ranking-region-select", "value"),
+    Input("indicator-select", "value"),
+    prevent_initial_call=True,
+)
+def update_ranking_indicator(indicator):
+    return region_options(get_data(indicator), "World"), "all"
 
 # --- Callback a Dashboard oldalhoz ---
 @app.callback(
@@ -157,46 +272,35 @@ def display_page(pathname):
     Output("country-select", "options"), Output("country-select", "value"),
     Input("country-select", "value"), Input("region-select", "value"),
     Input("color-scale-select", "value"), Input("map-chart", "clickData"),
+    Input("indicator-select", "value"),
 )
-def update_dashboard(selected_country_dropdown, selected_region, selected_scale, map_click):
-    ctx = dash.callback_context; triggered_id = ctx.triggered_id
+def update_dashboard(selected_country_dropdown, selected_region, selected_scale, map_click, indicator=None):
+    ctx = dash.callback_context; triggered_id = ctx.triggered_id; data = get_data(indicator)
     if selected_region == "all":
-        country_options = [{"label": "All countries", "value": "all"}] + [{"label": c, "value": c} for c in all_countries]
-        country_value = selected_country_dropdown if selected_country_dropdown in all_countries or selected_country_dropdown == "all" else "all"
+        country_options = [{"label": "All countries", "value": "all"}] + [{"label": c, "value": c} for c in data.countries]
+        country_value = selected_country_dropdown if selected_country_dropdown in data.country_region or selected_country_dropdown == "all" else "all"
     else:
-        region_countries = sorted(df[df["Region"] == selected_region]["Country / Territory"].dropna().unique())
+        region_countries = data.region_countries.get(selected_region, [])
         country_options = [{"label": "All countries", "value": "all"}] + [{"label": c, "value": c} for c in region_countries]
         country_value = selected_country_dropdown if selected_country_dropdown in region_countries else "all"
-    selected_year = latest_year; dff_full_year = df[df["Year"] == selected_year]
-    dff_map = dff_full_year; map_title = f"CPI {selected_year} - World"; region_context = None
+    selected_year = data.latest_year; dff_full_year = data.year(selected_year)
+    dff_map = dff_full_year; map_title = f"{data.short_label} {selected_year} - World"; region_context = None; level = "world"
     if country_value != "all":
-        dff_map = dff_full_year[dff_full_year["Country / Territory"] == country_value]
-        map_title = f"CPI {selected_year}: {country_value}"; region_context = dff_map.iloc[0]["Region"]
+        dff_map = data.country_year(country_value, selected_year)
+        map_title = f"{data.short_label} {selected_year}: {country_value}"; region_context = dff_map.iloc[0]["Region"]; level = "country"
     elif selected_region != "all":
-        dff_map = dff_full_year[dff_full_year["Region"] == selected_region]
-        map_title = f"CPI {selected_year} - {region_names.get(selected_region)}"; region_context = selected_region
-    map_fig = px.choropleth(dff_map, locations="ISO3", color="CPI score", hover_name="Country / Territory", color_continuous_scale=color_scales[selected_scale], range_color=(df["CPI score"].min(), df["CPI score"].max()), title=map_title)
-    map_fig.update_geos(showcoastlines=False, showland=True, fitbounds="locations", showcountries=False, showframe=False)
-    map_fig.update_layout(template="plotly_dark", plot_bgcolor="#000", paper_bgcolor="#000", font_color="#fff", margin=dict(l=10, r=10, t=40, b=10), coloraxis_showscale=False)
+        dff_map = data.year_region(selected_year, selected_region)
+        map_title = f"{data.short_label} {selected_year} - {data.region_names.get(selected_region, selected_region)}"; region_context = selected_region; level = "region"
+    map_fig = figure_cache.get(figure_key("nav-map", country_value, selected_region, selected_scale, selected_year),
+                               lambda: build_map_figure(dff_map, map_title, selected_scale, data, level), version=data.version)
     country_for_line_chart = country_value
     if triggered_id == "map-chart" and map_click: country_for_line_chart = map_click["points"][0]["hovertext"]
-    line_color = get_line_color(selected_scale); kpi_panel = html.Div()
+    kpi_panel = html.Div()
+    line_fig = figure_cache.get(figure_key("nav-line", country_for_line_chart, region_context, selected_scale),
+                                lambda: build_line_figure(country_for_line_chart, region_context, selected_scale, data), version=data.version)
     if country_for_line_chart != "all":
-        dff_line = df[df["Country / Territory"] == country_for_line_chart]
-        title = f"CPI Score Over Time: {country_for_line_chart}"
-        line_fig = px.line(dff_line, x="Year", y="CPI score", markers=True, title=title, line_shape="spline", color_discrete_sequence=line_color)
-        kpi_region = df.loc[df["Country / Territory"] == country_for_line_chart, "Region"].iloc[0]
-        kpi_panel = kpi_panel_row(country_for_line_chart, selected_year, df, region=kpi_region)
-    else:
-        if region_context:
-            dff_line = df[df["Region"] == region_context].groupby("Year").agg({"CPI score": "mean"}).reset_index()
-            title = f"CPI Score: {region_names.get(region_context, region_context)} (average)"
-        else:
-            dff_line = df.groupby("Year").agg({"CPI score": "mean"}).reset_index()
-            title = "CPI Score Over Time: World Average"
-        line_fig = px.line(dff_line, x="Year", y="CPI score", markers=True, title=title, line_shape="spline", color_discrete_sequence=line_color)
-    line_fig.update_traces(line=dict(width=4))
-    line_fig.update_layout(template="plotly_dark", plot_bgcolor="#111", paper_bgcolor="#111", font_color="#fff", margin=dict(l=10, r=10, t=40, b=10))
+        kpi_region = data.country_region[country_for_line_chart]
+        kpi_panel = kpi_panel_row(country_for_line_chart, selected_year, data, region=kpi_region)
     legend = color_scale_legend(selected_scale)
     return map_fig, line_fig, legend, kpi_panel, country_options, country_value
 
@@ -208,25 +312,39 @@ def update_dashboard(selected_country_dropdown, selected_region, selected_scale,
 def toggle_n_input_disabled(selected_mode):
     return selected_mode == "all"
 
-# --- Callback a Ranking oldalhoz ---
-@app.callback(
+# --- Callback a Ranking oldalhoz (háttér jobként, ha van job manager: jobs.py) ---
+@background_callback(
+    app,
     Output("ranking-chart-div", "children"),
     Input("ranking-region-select", "value"),
     Input("ranking-color-scale-select", "value"),
     Input("ranking-mode-select", "value"),
-    Input("ranking-n-input", "value")
+    Input("ranking-n-input", "value"),
+    Input("indicator-select", "value"),
+    progress=[Output("ranking-progress", "value"), Output("ranking-progress", "max")],
+    running=[(Output("ranking-progress", "style"), {"height": "3px", "visibility": "visible"}, {"height": "3px", "visibility": "hidden"})],
 )
-def update_ranking_page(selected_region, selected_scale, selected_mode, n_countries):
-    dff = df[df["Year"] == latest_year]
-    ranking_region_context = None
-    if selected_region != "all":
-        dff = dff[dff["Region"] == selected_region]
-        ranking_region_context = selected_region
-    if selected_mode != "all":
-        if n_countries is None or n_countries < 1: n_countries = 10
-        if selected_mode == "top": dff = dff.sort_values("CPI score", ascending=False).head(n_countries)
-        elif selected_mode == "bottom": dff = dff.sort_values("CPI score", ascending=True).head(n_countries)
-    return create_ranking_barchart(dff, ranking_region_context, selected_scale, latest_year)
+def update_ranking_page(selected_region, selected_scale, selected_mode, n_countries, indicator=None, set_progress=None):
+    data = get_data(indicator)
+    report(set_progress, 1, 3)
+    if selected_mode == "all": n_countries = None
+    elif n_countries is None or n_countries < 1: n_countries = 10
+    def build():
+        dff = data.year_region(data.latest_year, selected_region)
+        ranking_region_context = None
+        if selected_region != "all":
+            ranking_region_context = selected_region
+        best_first = not data.higher_is_better
+        if selected_mode == "top": dff = dff.sort_values(data.value, ascending=best_first, kind="stable").head(n_countries)
+        elif selected_mode == "bottom": dff = dff.sort_values(data.value, ascending=not best_first, kind="stable").head(n_countries)
+        fig = create_ranking_barchart(dff, ranking_region_context, selected_scale, data.latest_year, data)
+        report(set_progress, 2, 3)
+        return fig
+    fig = figure_cache.get(figure_key("nav-ranking", selected_region, selected_mode, n_countries, selected_scale, data.latest_year), build, version=data.version)
+    report(set_progress, 3, 3)
+    return dcc.Graph(figure=fig, config={"displayModeBar": False})
+
+startup_timer.mark("app")
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
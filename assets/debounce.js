@@ -0,0 +1,31 @@
+/* Nagy frekvenciájú bemenetek késleltetése: a szerver callbackek a csúszka helyett egy store-t
+   figyelnek, ami csak akkor kapja meg az értéket, ha a csúszka a megadott ideig nem mozdult.
+   A közben felülírt hívások no_update-tel zárulnak (a Dash amúgy is csak a legutolsót veszi). */
+(function () {
+    var pending = {};
+
+    function debounced(name) {
+        return function (value, delay, current) {
+            var noUpdate = window.dash_clientside.no_update;
+            var previous = pending[name];
+            if (previous) {
+                clearTimeout(previous.timer);
+                previous.resolve(noUpdate);
+            }
+            return new Promise(function (resolve) {
+                var entry = {resolve: resolve};
+                entry.timer = setTimeout(function () {
+                    delete pending[name];
+                    resolve(value === current ? noUpdate : value);
+                }, delay);
+                pending[name] = entry;
+            });
+        };
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        inputs: {
+            year: debounced("year"),
+        },
+    });
+})();
@@ -0,0 +1,55 @@
+/* ETag revalidáció a Dash callback kérésekhez: a böngésző POST-nál nem küld If-None-Match-et,
+   ezért az utolsó válaszokat a kérés törzse szerint megjegyezzük, és 304 esetén azt adjuk vissza
+   (szerver oldal: httpcache.py). */
+(function () {
+    var MAX_ENTRIES = 64;
+    var responses = new Map();
+    var originalFetch = window.fetch.bind(window);
+
+    function remember(key, entry) {
+        responses.delete(key);
+        responses.set(key, entry);
+        if (responses.size > MAX_ENTRIES) {
+            responses.delete(responses.keys().next().value);
+        }
+    }
+
+    window.fetch = function (input, init) {
+        var url = typeof input === "string" ? input : input && input.url;
+        if (
+            !init ||
+            init.method !== "POST" ||
+            typeof init.body !== "string" ||
+            !url ||
+            url.indexOf("_dash-update-component") === -1
+        ) {
+            return originalFetch(input, init);
+        }
+
+        // A háttér jobok lekérdezése ugyanazt a törzset küldi más query stringgel
+        var key = url + "\n" + init.body;
+        var cached = responses.get(key);
+        if (cached) {
+            var headers = new Headers(init.headers || {});
+            headers.set("If-None-Match", cached.etag);
+            init = Object.assign({}, init, {headers: headers});
+        }
+        return originalFetch(input, init).then(function (response) {
+            if (response.status === 304 && cached) {
+                remember(key, cached);
+                return new Response(cached.body, {
+                    status: 200,
+                    headers: {"Content-Type": "application/json"},
+                });
+            }
+            var etag = response.headers.get("ETag");
+            if (response.status !== 200 || !etag) {
+                return response;
+            }
+            return response.clone().text().then(function (body) {
+                remember(key, {etag: etag, body: body});
+                return response;
+            });
+        });
+    };
+})();
@@ -0,0 +1,44 @@
+/* Évek lejátszása a térképen szerver nélkül: a map-year-data store-ból cseréljük a choropleth adatait */
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    playback: {
+        render_year: function (sliderYear, playYear, yearData, figure) {
+            const noUpdate = window.dash_clientside.no_update;
+            if (!yearData || !figure || !figure.data || !figure.data.length) {
+                return noUpdate;
+            }
+            const year = playYear !== null && playYear !== undefined ? playYear : sliderYear;
+            const frame = yearData.frames[String(year)] || {locations: [], z: [], hovertext: []};
+
+            const trace = Object.assign({}, figure.data[0], {
+                locations: frame.locations,
+                z: frame.z,
+                hovertext: frame.hovertext,
+            });
+            const layout = Object.assign({}, figure.layout);
+            layout.annotations = (layout.annotations || []).map(function (annotation, i) {
+                return i === 0 ? Object.assign({}, annotation, {text: String(year)}) : annotation;
+            });
+            return Object.assign({}, figure, {data: [trace].concat(figure.data.slice(1)), layout: layout});
+        },
+
+        toggle: function (nClicks, intervalDisabled, playYear) {
+            const noUpdate = window.dash_clientside.no_update;
+            if (intervalDisabled) {
+                return [false, "Pause", noUpdate, noUpdate];
+            }
+            // Megállításkor a csúszka átveszi a lejátszott évet
+            const sliderYear = playYear !== null && playYear !== undefined ? playYear : noUpdate;
+            return [true, "Play", sliderYear, null];
+        },
+
+        advance: function (nIntervals, playYear, sliderYear, yearData) {
+            if (!yearData || !yearData.years.length) {
+                return window.dash_clientside.no_update;
+            }
+            const years = yearData.years;
+            const current = playYear !== null && playYear !== undefined ? playYear : sliderYear;
+            const next = years.indexOf(current) + 1;
+            return years[next < years.length ? next : 0];
+        },
+    },
+});
@@ -0,0 +1,13 @@
+/* Új mutató / régió / mód / év vagy a Ranking fül megnyitása esetén a grid újrakéri a sorokat */
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    ranking: {
+        refresh: function (region, mode, year, activeTab) {
+            if (activeTab === "tab-ranking") {
+                dash_ag_grid.getApiAsync("ranking-grid").then(function (api) {
+                    api.purgeInfiniteCache();
+                });
+            }
+            return window.dash_clientside.no_update;
+        },
+    },
+});
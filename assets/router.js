@@ -0,0 +1,11 @@
+/* appnav.py: a felcsatolt oldalak közül csak az aktuális látszik, a többi rejtve marad */
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    router: {
+        show: function (pathname) {
+            var active = pathname === "/ranking" ? "/ranking" : "/";
+            return ["/", "/ranking"].map(function (path) {
+                return {display: path === active ? "block" : "none"};
+            });
+        },
+    },
+});
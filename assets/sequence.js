@@ -0,0 +1,63 @@
+/* Callback kérések sorrendezése (szerver oldal: sequencing.py): kimenetenként egyszerre egy kérés
+   fut, a közben érkezők közül csak a legújabb vár, a régebbiek 204-et (nincs frissítés) kapnak.
+   A Dash kliens a régebbi kérések eredményét amúgy is eldobja. Minden kérés viszi a fül
+   azonosítóját és egy növekvő sorszámot, valamint a legutóbbi óta kihagyott kérések számát. */
+(function () {
+    var session = Math.random().toString(36).slice(2) + Date.now().toString(36);
+    var seq = 0;
+    var inFlight = new Set();
+    var waiting = new Map();
+    var superseded = new Map();
+    var originalFetch = window.fetch.bind(window);
+
+    function send(output, input, init) {
+        var headers = new Headers(init.headers || {});
+        headers.set("X-Dash-Session", session);
+        headers.set("X-Dash-Seq", String(++seq));
+        if (superseded.has(output)) {
+            headers.set("X-Dash-Superseded", String(superseded.get(output)));
+            superseded.delete(output);
+        }
+        inFlight.add(output);
+        return originalFetch(input, Object.assign({}, init, {headers: headers})).finally(function () {
+            inFlight.delete(output);
+            var next = waiting.get(output);
+            if (next) {
+                waiting.delete(output);
+                send(output, next.input, next.init).then(next.resolve, next.reject);
+            }
+        });
+    }
+
+    window.fetch = function (input, init) {
+        var url = typeof input === "string" ? input : input && input.url;
+        if (
+            !init ||
+            init.method !== "POST" ||
+            typeof init.body !== "string" ||
+            !url ||
+            url.indexOf("_dash-update-component") === -1 ||
+            // A háttér jobok lekérdezései ugyanahhoz a kéréshez tartoznak
+            /[?&](job|cacheKey)=/.test(url)
+        ) {
+            return originalFetch(input, init);
+        }
+        var output;
+        try {
+            output = JSON.parse(init.body).output;
+        } catch (e) {
+            return originalFetch(input, init);
+        }
+        if (!inFlight.has(output)) {
+            return send(output, input, init);
+        }
+        return new Promise(function (resolve, reject) {
+            var previous = waiting.get(output);
+            if (previous) {
+                superseded.set(output, (superseded.get(output) || 0) + 1);
+                previous.resolve(new Response(null, {status: 204}));
+            }
+            waiting.set(output, {input: input, init: init, resolve: resolve, reject: reject});
+        });
+    };
+})();
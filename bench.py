@@ -0,0 +1,308 @@
+import argparse
+import itertools
+import json
+import platform
+import statistics
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import dash
+import pandas as pd
+import plotly
+from dash._callback_context import context_value
+from dash._utils import AttributeDict
+
+import app
+import appnav
+import cpidata
+import metrics
+import prerender
+from figcache import figure_cache
+
+# Callback futásidő-mérés: minden callbacket közvetlenül hívunk egy bemeneti rácson,
+# fázisonként mérve (adatelérés, ábra/komponens építés, JSON szerializálás).
+# Hideg mérésnél (alapértelmezés) a figure cache üres és a prerender artifact ki van kapcsolva,
+# így minden ábra ténylegesen felépül; --warm esetén a prerender a CPI_PRERENDER szerint megy.
+
+
+class TimedData:
+    # A CPIData snapshot köré tett proxy: a metódushívások ideje az "data" fázisba kerül
+    def __init__(self, data):
+        self._data = data
+        self.elapsed = 0.0
+
+    def __getattr__(self, name):
+        value = getattr(self._data, name)
+        if not callable(value):
+            return value
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return value(*args, **kwargs)
+            finally:
+                self.elapsed += time.perf_counter() - start
+
+        return timed
+
+
+def _serialize(result):
+    return json.dumps(result, cls=plotly.utils.PlotlyJSONEncoder)
+
+
+def measure(module, func, args, warm=False):
+    data = TimedData(cpidata.get_data())
+    original = module.get_data
+    module.get_data = lambda indicator=None: data
+    prerender_enabled = prerender.PRERENDER_ENABLED
+    if not warm:
+        figure_cache.clear()
+        prerender.PRERENDER_ENABLED = False
+    try:
+        start = time.perf_counter()
+        try:
+            result = func(*args)
+        except dash.exceptions.PreventUpdate:
+            result = None
+        total = time.perf_counter() - start
+    finally:
+        module.get_data = original
+        prerender.PRERENDER_ENABLED = prerender_enabled
+
+    start = time.perf_counter()
+    payload = _serialize(result)
+    serialize = time.perf_counter() - start
+    return {
+        "data_ms": data.elapsed * 1000,
+        "build_ms": (total - data.elapsed) * 1000,
+        "serialize_ms": serialize * 1000,
+        "total_ms": (total + serialize) * 1000,
+        "payload_bytes": len(payload.encode("utf-8")),
+    }
+
+
+def country_selections(data, region):
+    countries = data.countries if region == "all" else data.region_countries[region]
+    return {"0": [], "1": countries[:1], "10": countries[:10], "all": list(countries)}
+
+
+def cases(quick=False):
+    data = cpidata.get_data()
+    years = [data.min_year, data.latest_year] if quick else data.years
+    regions = ["all"] + data.regions
+    scales = list(app.color_scales)[:1] if quick else list(app.color_scales)
+    all_rows = {"startRow": 0, "endRow": 10000}
+
+    for region in regions:
+        selections = country_selections(data, region)
+        for size, countries in selections.items():
+            params = {"region": region, "countries": size}
+            yield "app.update_country_options", params, app, app.update_country_options, (region, countries)
+            yield "app.update_map_year_data", params, app, app.update_map_year_data, (countries, region)
+            for scale in scales:
+                yield "app.update_line_chart", dict(params, scale=scale), app, app.update_line_chart, (countries, region, scale)
+            for year in years:
+                yield "app.update_kpi_panel", dict(params, year=year), app, app.update_kpi_panel, (countries, region, year)
+                for scale in scales:
+                    yield "app.update_map", dict(params, year=year, scale=scale), app, app.update_map, (countries, region, year, scale)
+
+        for mode, year in itertools.product(["Top 10", "Bottom 10", "All"], years):
+            params = {"region": region, "mode": mode, "year": year}
+            yield "app.get_ranking_rows", params, app, app.get_ranking_rows, (all_rows, region, mode, year, "tab-ranking")
+
+        for country in ["all"] + selections["1"]:
+            for scale in scales:
+                params = {"region": region, "country": country, "scale": scale}
+                yield "appnav.update_dashboard", params, appnav, appnav.update_dashboard, (country, region, scale, None)
+
+        for mode, scale in itertools.product(["all", "top", "bottom"], scales):
+            params = {"region": region, "mode": mode, "scale": scale}
+            yield "appnav.update_ranking_page", params, appnav, appnav.update_ranking_page, (region, scale, mode, 10)
+
+    for pathname in ["/", "/ranking"]:
+        yield "appnav.display_page", {"pathname": pathname}, appnav, appnav.display_page, (pathname, [])
+
+
+def metrics_overhead(n=2000):
+    # Egy olcsó callback (színskála-legenda) HTTP-n keresztül, metrikákkal és nélkülük
+    client = app.server.test_client()
+    body = {
+        "output": "color-legend-div.children",
+        "outputs": {"id": "color-legend-div", "property": "children"},
+        "inputs": [{"id": "color-scale-select", "property": "value", "value": "Plasma"}],
+        "changedPropIds": ["color-scale-select.value"],
+        "state": [],
+    }
+    client.get("/")
+    timings = {}
+    enabled = metrics.ENABLED
+    try:
+        for label, flag in (("without", False), ("with", True), ("without", False), ("with", True)):
+            metrics.ENABLED = flag
+            start = time.perf_counter()
+            for _ in range(n):
+                client.post("/_dash-update-component", json=body)
+            timings.setdefault(label, []).append((time.perf_counter() - start) / n * 1e6)
+    finally:
+        metrics.ENABLED = enabled
+    without, with_ = min(timings["without"]), min(timings["with"])
+    return {
+        "request_us_without": round(without, 1),
+        "request_us_with": round(with_, 1),
+        "overhead_us": round(with_ - without, 1),
+        "overhead_pct": round((with_ - without) / without * 100, 2),
+    }
+
+
+# A tábla memóriaigénye külön folyamatban mérve (tiszta RSS), tömör és alapértelmezett típusokkal
+_MEMORY_PROBE = """
+import json, sys
+import pandas
+import cpidata
+before = cpidata._rss_bytes()
+data = cpidata.load_data(sys.argv[1], use_cache=False)
+print(json.dumps({"memory_bytes": data.memory_bytes, "rss_delta_bytes": cpidata._rss_bytes() - before}))
+"""
+
+
+def synthetic_csv(path, scale):
+    # A CSV országai scale-szer, átnevezve (a régiók és évek változatlanok)
+    df = pd.read_csv(cpidata.DATA_PATH)
+    copies = [
+        df.assign(**{cpidata.COUNTRY: df[cpidata.COUNTRY] + f" #{i}", "ISO3": df["ISO3"] + str(i)})
+        for i in range(scale)
+    ]
+    pd.concat(copies, ignore_index=True).to_csv(path, index=False)
+
+
+def memory_footprint(scale=100):
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for factor in sorted({1, scale}):
+            path = cpidata.DATA_PATH
+            if factor > 1:
+                path = os.path.join(tmp, f"cpi-x{factor}.csv")
+                synthetic_csv(path, factor)
+            for label, flag in (("default", "0"), ("compact", "1")):
+                env = dict(os.environ, CPI_COMPACT_DTYPES=flag)
+                out = subprocess.run(
+                    [sys.executable, "-c", _MEMORY_PROBE, path],
+                    capture_output=True, text=True, env=env, check=True,
+                ).stdout
+                report[f"x{factor} {label}"] = json.loads(out.strip().splitlines()[-1])
+    return report
+
+
+def case_id(name, params):
+    return name + "[" + ",".join(f"{k}={v}" for k, v in params.items()) + "]"
+
+
+def run(quick=False, repeat=1, warm=False):
+    # appnav.update_dashboard a callback_context-et is olvassa
+    context_value.set(AttributeDict(triggered_inputs=[{"prop_id": "region-select.value", "value": None}]))
+    results = {}
+    for name, params, module, func, args in cases(quick):
+        runs = [measure(module, func, args, warm=warm) for _ in range(repeat)]
+        results[case_id(name, params)] = {
+            key: round(statistics.median(r[key] for r in runs), 3) for key in runs[0]
+        }
+    return results
+
+
+def summarize(results):
+    by_callback = {}
+    for cid, r in results.items():
+        by_callback.setdefault(cid.split("[", 1)[0], []).append(r)
+    summary = {}
+    for name, runs in by_callback.items():
+        totals = sorted(r["total_ms"] for r in runs)
+        summary[name] = {
+            "cases": len(runs),
+            "median_ms": round(statistics.median(totals), 3),
+            "p95_ms": round(totals[min(len(totals) - 1, int(len(totals) * 0.95))], 3),
+            **{
+                f"mean_{key}": round(statistics.mean(r[key] for r in runs), 3)
+                for key in ("data_ms", "build_ms", "serialize_ms", "payload_bytes")
+            },
+        }
+    return summary
+
+
+def metadata(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "plotly": plotly.__version__,
+        "dash": dash.__version__,
+        "quick": args.quick,
+        "repeat": args.repeat,
+        "warm": args.warm,
+        "prerender": args.warm and prerender.PRERENDER_ENABLED,
+    }
+
+
+def compare(old, new, threshold):
+    print(f"{'callback':32} {'old ms':>10} {'new ms':>10} {'ratio':>7} {'old B':>10} {'new B':>10}")
+    regressions = []
+    for name in sorted(set(old["summary"]) | set(new["summary"])):
+        o, n = old["summary"].get(name), new["summary"].get(name)
+        if not o or not n:
+            print(f"{name:32} {'-' if not o else o['median_ms']:>10} {'-' if not n else n['median_ms']:>10}")
+            continue
+        ratio = n["median_ms"] / o["median_ms"] if o["median_ms"] else float("inf")
+        flag = " REGRESSION" if ratio > 1 + threshold else ""
+        if flag:
+            regressions.append(name)
+        print(
+            f"{name:32} {o['median_ms']:>10} {n['median_ms']:>10} {ratio:>7.2f} "
+            f"{o['mean_payload_bytes']:>10.0f} {n['mean_payload_bytes']:>10.0f}{flag}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Dash callbacks of app.py and appnav.py.")
+    parser.add_argument("--quick", action="store_true", help="first/last year and one color scale only")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case (median is kept)")
+    parser.add_argument("--warm", action="store_true", help="keep the figure cache between runs")
+    parser.add_argument("--output", help="write results as JSON baseline to this file")
+    parser.add_argument("--compare", help="baseline JSON to diff the results against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before flagging (0.2 = 20%%)")
+    parser.add_argument("--metrics-overhead", action="store_true", help="only measure the /metrics instrumentation cost")
+    parser.add_argument("--memory", type=int, nargs="?", const=100, metavar="SCALE",
+                        help="only measure the table memory, also on a SCALE-times synthetic dataset (default 100)")
+    args = parser.parse_args()
+
+    if args.metrics_overhead:
+        print(json.dumps(metrics_overhead()))
+        return
+    if args.memory:
+        for name, usage in memory_footprint(args.memory).items():
+            print(f"{name:16} {json.dumps(usage)}")
+        return
+
+    results = run(quick=args.quick, repeat=args.repeat, warm=args.warm)
+    report = {"meta": metadata(args), "summary": summarize(results), "cases": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        raise SystemExit(1 if regressions else 0)
+
+    for name, s in report["summary"].items():
+        print(f"{name:32} {json.dumps(s)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import argparse
+import importlib
+import sys
+from collections import Counter
+
+# A callback gráf ellenőrzése: a dash-renderer dev tools validációja ("Duplicate callback
+# outputs") üresen hagyja a callback gráfot, ha egy kimenetet több callback is ír
+# allow_duplicate nélkül, és ilyenkor egyetlen callback sem fut. Ugyanazt a függőségi listát
+# nézzük, amit a böngésző kap (/_dash-dependencies), debug módban betöltött appal.
+#
+#     python checkcallbacks.py app appnav
+APPS = ("app", "appnav")
+
+
+def _outputs(dependency):
+    # Több kimenetnél "..a.prop...b.prop.."; az allow_duplicate kimenetek "@hash" végződésűek
+    output = dependency["output"]
+    if output.startswith(".."):
+        return output[2:-2].split("...")
+    return [output]
+
+
+def duplicate_outputs(module_name):
+    module = importlib.import_module(module_name)
+    module.app.enable_dev_tools(debug=True, dev_tools_hot_reload=False)
+    client = module.server.test_client()
+    client.get("/")
+    dependencies = client.get("/_dash-dependencies").get_json()
+    counts = Counter(output for dependency in dependencies for output in _outputs(dependency))
+    return sorted(output for output, n in counts.items() if n > 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the Dash callback graph for duplicate outputs.")
+    parser.add_argument("apps", nargs="*", default=APPS, help="app modules to check")
+    args = parser.parse_args()
+
+    failed = False
+    for name in args.apps:
+        duplicates = duplicate_outputs(name)
+        print(f"{name}: {'duplicate outputs: ' + ', '.join(duplicates) if duplicates else 'ok'}")
+        failed = failed or bool(duplicates)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
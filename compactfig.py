@@ -0,0 +1,103 @@
+import base64
+import os
+
+# Kisebb figure JSON a callback válaszokban: a template-ből csak a ténylegesen használt
+# részek maradnak, a numerikus tömbök base64 typed array-ként mennek, a lebegőpontos
+# értékek az adatkészlet pontosságára kerekítve, és a plotly.js alapértékeit elhagyjuk.
+COMPACT_FIGURES = os.environ.get("CPI_COMPACT_FIGURES", "1") == "1"
+FLOAT_DIGITS = int(os.environ.get("CPI_FIGURE_FLOAT_DIGITS", 2))
+# Ennél rövidebb listákon a base64 nem spórol
+MIN_TYPED_ARRAY_LENGTH = 8
+
+ARRAY_KEYS = ("x", "y", "z", "lat", "lon", "customdata")
+
+# plotly.js alapértékek, amiket a plotly.py/px kiír
+TRACE_DEFAULTS = {"legendgroup": "", "xaxis": "x", "yaxis": "y", "geo": "geo"}
+NESTED_DEFAULTS = {("marker", "symbol"): "circle", ("line", "dash"): "solid"}
+SCATTER_DEFAULTS = {"orientation": "v"}
+
+# Template layout kulcsok, amik csak az adott subplot típus jelenlétekor számítanak
+SUBPLOT_TEMPLATE_KEYS = {
+    "geo": ("geo",),
+    "xaxis": ("xaxis", "yaxis"),
+    "polar": ("polar",),
+    "ternary": ("ternary",),
+    "scene": ("scene",),
+    "mapbox": ("mapbox",),
+    "map": ("map",),
+    "coloraxis": ("coloraxis",),
+}
+_CARTESIAN = {"scatter", "bar", "histogram", "box", "violin", "heatmap", "contour", "scattergl"}
+_GEO = {"choropleth", "scattergeo"}
+
+# A numpy csak az első ábra tömörítésekor töltődik be (gyors indulás, startup.py)
+_INT_DTYPES = (("i1", "int8"), ("u1", "uint8"), ("i2", "int16"), ("u2", "uint16"), ("i4", "int32"))
+
+
+def _encode(values):
+    import numpy as np
+
+    if values.dtype.kind == "f":
+        values = np.round(values, FLOAT_DIGITS)
+        if np.isfinite(values).all() and (values == np.round(values)).all():
+            values = values.astype(np.int64)
+    if values.dtype.kind in "iu":
+        lo, hi = (values.min(), values.max()) if values.size else (0, 0)
+        for name, dtype in _INT_DTYPES:
+            info = np.iinfo(dtype)
+            if info.min <= lo and hi <= info.max:
+                return {"dtype": name, "bdata": base64.b64encode(values.astype(dtype).tobytes()).decode("ascii")}
+        return None
+    return {"dtype": "f8", "bdata": base64.b64encode(values.astype("<f8").tobytes()).decode("ascii")}
+
+
+def _compact_array(value):
+    import numpy as np
+
+    if isinstance(value, dict) and "bdata" in value and "dtype" in value and "shape" not in value:
+        values = np.frombuffer(base64.b64decode(value["bdata"]), dtype=np.dtype(value["dtype"]).newbyteorder("<"))
+        return _encode(values) or value
+    if isinstance(value, list) and value and all(
+        isinstance(v, (int, float)) and not isinstance(v, bool) for v in value
+    ):
+        if len(value) < MIN_TYPED_ARRAY_LENGTH:
+            return [round(v, FLOAT_DIGITS) if isinstance(v, float) else v for v in value]
+        return _encode(np.asarray(value)) or value
+    return value
+
+
+def _compact_trace(trace):
+    trace = {k: v for k, v in trace.items() if TRACE_DEFAULTS.get(k, object()) != v}
+    if trace.get("type", "scatter") == "scatter":
+        trace = {k: v for k, v in trace.items() if SCATTER_DEFAULTS.get(k, object()) != v}
+    for (parent, key), default in NESTED_DEFAULTS.items():
+        if isinstance(trace.get(parent), dict) and trace[parent].get(key) == default:
+            trace[parent] = {k: v for k, v in trace[parent].items() if k != key}
+    for key in ARRAY_KEYS:
+        if key in trace:
+            trace[key] = _compact_array(trace[key])
+    return trace
+
+
+def _prune_template(template, traces, layout):
+    trace_types = {t.get("type", "scatter") for t in traces}
+    used = set()
+    if trace_types & _GEO:
+        used.add("geo")
+    if trace_types & _CARTESIAN:
+        used.add("xaxis")
+    if any("coloraxis" in t for t in traces) or "coloraxis" in layout:
+        used.add("coloraxis")
+    dropped = {k for kind, keys in SUBPLOT_TEMPLATE_KEYS.items() if kind not in used for k in keys}
+    return {
+        "data": {k: v for k, v in template.get("data", {}).items() if k in trace_types},
+        "layout": {k: v for k, v in template.get("layout", {}).items() if k not in dropped},
+    }
+
+
+def compact_figure(figure):
+    traces = [_compact_trace(t) for t in figure.get("data", [])]
+    layout = dict(figure.get("layout", {}))
+    if isinstance(layout.get("template"), dict):
+        layout["template"] = _prune_template(layout["template"], traces, layout)
+    return dict(figure, data=traces, layout=layout)
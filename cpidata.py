@@ -0,0 +1,556 @@
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import resource
+import threading
+import time
+from collections import OrderedDict
+
+from npcache import read_cache, write_cache
+
+DATA_PATH = "CPI-historical.csv"
+# Ennyi másodpercenként nézzük meg, változott-e a CSV (0: nincs automatikus újratöltés).
+# Csak akkor töltünk újra, ha a fájl mérete és időbélyege két egymást követő ellenőrzésnél
+# ugyanaz volt (a helyben, több lépésben írt CSV-t így nem olvassuk be félkészen). Az írók
+# számára a javasolt mód továbbra is az ideiglenes fájl + átnevezés (os.replace).
+RELOAD_CHECK_INTERVAL = float(os.environ.get("CPI_RELOAD_CHECK_INTERVAL", 5))
+
+COUNTRY = "Country / Territory"
+SCORE = "CPI score"
+WORLD_RANK = "World rank"
+REGION_RANK = "Region rank"
+# Az aggregátum kocka oszlopai (régió x év, illetve a világ "all" kulccsal)
+AGGREGATE_STATS = ("mean", "median", "count", "min", "max", "weighted_mean")
+# A betöltött mutatók becsült memóriájának felső korlátja; felette a legrégebben használt
+# (nem alapértelmezett) mutató kikerül a memóriából, és a következő kéréskor töltődik újra
+INDICATOR_MEMORY_LIMIT = int(float(os.environ.get("CPI_INDICATOR_MEMORY_MB", 1024)) * 2**20)
+# Tömör típusok a memóriában tartott táblákban (compact_dtypes); "0": a pandas alapértelmezett
+# típusai, csak összehasonlító méréshez (python bench.py --memory)
+COMPACT_DTYPES = os.environ.get("CPI_COMPACT_DTYPES", "1") == "1"
+# További mutatók JSON leírása: [{"key": ..., "path": ..., "value": ..., ...}, ...]
+INDICATORS_FILE = os.environ.get("CPI_INDICATORS_FILE", "")
+
+REGION_NAMES = {
+    "WE/EU": "Western Europe / European Union",
+    "AP": "Asia Pacific",
+    "AME": "Americas",
+    "SSA": "Sub-Saharan Africa",
+    "MENA": "Middle East & North Africa",
+    "ECA": "Eastern Europe & Central Asia",
+}
+
+
+class Indicator:
+    # Egy mutató sémája: a forrásfájl, az érték oszlop és a szerkezeti oszlopok nevei.
+    # Betöltéskor a szerkezeti oszlopok a közös nevekre (COUNTRY, ISO3, Year, Region)
+    # fordulnak, az érték oszlop neve megmarad (ez jelenik meg az ábrák tengelyein).
+    def __init__(
+        self,
+        key,
+        path,
+        value,
+        label=None,
+        short_label=None,
+        country=COUNTRY,
+        iso3="ISO3",
+        year="Year",
+        region="Region",
+        error=None,
+        region_names=None,
+        higher_is_better=True,
+    ):
+        self.key = key
+        self.path = path
+        self.value = value
+        self.label = label or value
+        self.short_label = short_label or self.label
+        self.country = country
+        self.iso3 = iso3
+        self.year = year
+        self.region = region
+        self.error = error
+        self.region_names = region_names or {}
+        self.higher_is_better = higher_is_better
+
+    def rename_map(self):
+        columns = ((self.country, COUNTRY), (self.iso3, "ISO3"), (self.year, "Year"), (self.region, "Region"))
+        return {source: target for source, target in columns if source != target}
+
+    def fingerprint(self):
+        return json.dumps(vars(self), sort_keys=True)
+
+
+INDICATORS = {}
+DEFAULT_INDICATOR = "cpi"
+
+
+def register_indicator(indicator):
+    INDICATORS[indicator.key] = indicator
+    return indicator
+
+
+def load_indicator_file(path):
+    with open(path, encoding="utf-8") as f:
+        for spec in json.load(f):
+            register_indicator(Indicator(**spec))
+
+
+register_indicator(Indicator(
+    DEFAULT_INDICATOR,
+    DATA_PATH,
+    SCORE,
+    label="CPI Score",
+    short_label="CPI",
+    error="Standard error",
+    region_names=REGION_NAMES,
+))
+if INDICATORS_FILE:
+    load_indicator_file(INDICATORS_FILE)
+
+
+def _slices(frame, keys):
+    # A frame kulcsok szerint rendezett, így minden csoport egy folytonos sorszakasz
+    return {
+        key: slice(int(idx[0]), int(idx[-1]) + 1)
+        for key, idx in frame.groupby(keys, sort=False, observed=True).indices.items()
+    }
+
+
+def _with_ranks(df, value=SCORE, ascending=False):
+    # Világ- és régiós helyezés minden (ország, év) párra, ugyanúgy mint a ranking gridben: rank(method="min")
+    score = df[value]
+    return df.assign(**{
+        WORLD_RANK: score.groupby(df["Year"]).rank(method="min", ascending=ascending).astype(int),
+        REGION_RANK: score.groupby([df["Year"], df["Region"]], dropna=False, observed=True)
+        .rank(method="min", ascending=ascending)
+        .astype(int),
+    })
+
+
+def compact_dtypes(df, error=None):
+    # Típusos séma: a szöveges oszlopok kategóriák (rendezett kategóriákkal, így a rendezés és a
+    # csoportosítás ugyanaz, mint szövegként), az egész oszlopok (pontszám, helyezések, CI, év)
+    # a legkisebb elég széles egész típusúak, a standard hiba float32. Az aggregátumok és az API
+    # kimenet float64-ben számol/ír, így az eredmények nem változnak. A kategória oszlopok szerinti
+    # groupby mindenhol observed=True: a pandas 2 alapértelmezése (False) a szűrt táblában nem
+    # szereplő kategóriákat is csoportként adná vissza.
+    import pandas as pd
+
+    columns = {}
+    for name, series in df.items():
+        dtype = series.dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_string_dtype(dtype) or pd.api.types.is_object_dtype(dtype):
+            columns[name] = series.astype("category")
+        elif pd.api.types.is_integer_dtype(dtype):
+            narrow = pd.to_numeric(series, downcast="integer")
+            if narrow.dtype != dtype:
+                columns[name] = narrow
+        elif name == error and dtype == "float64":
+            columns[name] = series.astype("float32")
+    return df.assign(**columns) if columns else df
+
+
+def extremes(frame, column=SCORE):
+    # ((év, érték) a minimumnál, (év, érték) a maximumnál), holtversenynél az első év
+    values = frame[column]
+    if values.dropna().empty:
+        return None
+    lo, hi = values.idxmin(), values.idxmax()
+    return (
+        (int(frame.at[lo, "Year"]), values[lo]),
+        (int(frame.at[hi, "Year"]), values[hi]),
+    )
+
+
+def _aggregate(df, keys, value=SCORE, error=None):
+    # A standard hiba inverz négyzetével súlyozott átlag (hiányzó hibánál a sor kimarad);
+    # hibaoszlop nélküli mutatónál a súlyozott átlag üres
+    score = df[value]
+    if error is not None:
+        weight = (1 / df[error].astype("float64") ** 2).where(score.notna())
+    else:
+        import pandas as pd
+
+        weight = pd.Series(float("nan"), index=df.index)
+    frame = df.assign(_w=weight, _ws=weight * score)
+    grouped = frame.groupby(keys, observed=True)
+    cube = grouped[value].agg(["mean", "median", "count", "min", "max"])
+    cube["weighted_mean"] = grouped["_ws"].sum(min_count=1) / grouped["_w"].sum(min_count=1)
+    return cube
+
+
+def _aggregate_cube(df, value=SCORE, error=None):
+    cube = {"all": _aggregate(df, "Year", value, error).reset_index()}
+    regional = _aggregate(df, ["Region", "Year"], value, error)
+    for region, frame in regional.groupby(level="Region", observed=True):
+        cube[region] = frame.droplevel("Region").reset_index()
+    return cube
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+logger = logging.getLogger(__name__)
+
+
+class CPIData:
+    def __init__(self, df, version=None, country_order=None, indicator=None):
+        # A pandas az első betöltéskor importálódik, nem a modul importjakor (startup.py)
+        import pandas as pd
+
+        # A verzió azonosítja az adatkészletet (cache-ek érvénytelenítéséhez)
+        self.version = version
+        indicator = indicator or INDICATORS[DEFAULT_INDICATOR]
+        self.indicator = indicator
+        self.key = indicator.key
+        self.value = indicator.value
+        self.label = indicator.label
+        self.short_label = indicator.short_label
+        self.region_names = indicator.region_names
+        self.higher_is_better = indicator.higher_is_better
+        rename = indicator.rename_map()
+        if rename:
+            df = df.rename(columns=rename)
+        if df[self.value].isna().any():
+            df = df[df[self.value].notna()]
+        # A helyezések, a KPI panel és a helyezés-idősorok országonként és évenként egy sort
+        # feltételeznek; a részletesebb (pl. alrégiós) mutatót előbb aggregálni kell
+        duplicated = df.duplicated([COUNTRY, "Year"])
+        if duplicated.any():
+            country, year = df.loc[duplicated, [COUNTRY, "Year"]].iloc[0]
+            raise ValueError(
+                f"Indicator {self.key} has {int(duplicated.sum())} duplicate country/year rows "
+                f"(first: {country}, {year}); expected one row per country and year"
+            )
+        # Az országok CSV-beli sorrendje (az év szerint rendezett táblából már nem olvasható ki)
+        if country_order is None:
+            country_order = pd.unique(df[COUNTRY])
+        self.country_order = [c for c in country_order if pd.notna(c)]
+        if WORLD_RANK not in df.columns:
+            df = _with_ranks(df, self.value, ascending=not self.higher_is_better)
+        if COMPACT_DTYPES:
+            df = compact_dtypes(df, indicator.error)
+        # Egyetlen tábla év szerint rendezve, a régió (+év) és ország szerinti nézet csak
+        # sorpozíciók (int32) ebbe a táblába, folytonos szeletekkel; így a memory-mappelt
+        # oszlopokról nem készül rendezett másolat. Stabil rendezés, így a csoportokon belül
+        # a CSV eredeti sorrendje marad meg. Az npy cache már év szerint rendezve tárol: ilyenkor
+        # nem rendezünk (a pandas 2 a rendezett táblán is másolna), a self.df oszlopai a
+        # memory-mappelt tömbök maradnak.
+        if df["Year"].is_monotonic_increasing and df.index.equals(pd.RangeIndex(len(df))):
+            self.df = df
+        else:
+            self.df = df.sort_values("Year", kind="stable", ignore_index=True)
+        by_region = self.df[["Region", "Year"]].sort_values(["Region", "Year"], kind="stable")
+        self._region_rows = by_region.index.to_numpy(dtype="int32")
+        order = {c: i for i, c in enumerate(self.country_order)}
+        countries = self.df[[COUNTRY, "Year"]].assign(
+            # Kategória oszlopon a map is kategóriát adna, ami a kódok sorrendjében rendezne
+            _order=self.df[COUNTRY].map(order).astype("float64")
+        ).sort_values(["_order", "Year"], kind="stable")
+        self._country_rows = countries.index.to_numpy(dtype="int32")
+        self._empty = self.df.iloc[0:0]
+
+        self._year_idx = _slices(self.df, "Year")
+        self._year_region_idx = _slices(by_region, ["Region", "Year"])
+        self._region_idx = _slices(by_region, "Region")
+        self._country_idx = _slices(countries, COUNTRY)
+
+        self.years = sorted(int(y) for y in self._year_idx)
+        self.regions = sorted(r for r in self._region_idx if pd.notna(r))
+        self.countries = sorted(c for c in self._country_idx if pd.notna(c))
+        self.latest_year = max(self.years)
+        self.min_year = min(self.years)
+        self.score_range = (self.df[self.value].min(), self.df[self.value].max())
+
+        self.region_countries = {
+            r: sorted(self.region(r)[COUNTRY].dropna().unique()) for r in self.regions
+        }
+        # Az ország szerinti teljes tábla csak a betöltés idejére készül el
+        by_country = self.df.take(self._country_rows)
+        self.country_region = (
+            by_country.drop_duplicates(COUNTRY, keep="last")
+            .set_index(COUNTRY)["Region"]
+            .to_dict()
+        )
+        self.iso3_country = (
+            by_country.drop_duplicates("ISO3", keep="last")
+            .set_index("ISO3")[COUNTRY]
+            .to_dict()
+        )
+
+        world_total = by_country.groupby("Year")["Year"].transform("size")
+        region_total = by_country.groupby(["Year", "Region"], dropna=False, observed=True)["Year"].transform("size")
+        self._ranks = dict(zip(
+            zip(by_country[COUNTRY], by_country["Year"]),
+            zip(by_country[WORLD_RANK], world_total, by_country[REGION_RANK], region_total),
+        ))
+        # Ország x év mátrixok a helyezés-idősoros grafikonokhoz
+        self._rank_history = {
+            col: by_country.pivot(index=COUNTRY, columns="Year", values=col)
+            for col in (WORLD_RANK, REGION_RANK)
+        }
+        # Régiós és világ idősorok évenkénti statisztikái, a min/max pontokkal együtt
+        self._cube = _aggregate_cube(self.df, self.value, indicator.error)
+        self._cube_extremes = {
+            (region, stat): extremes(frame, stat)
+            for region, frame in self._cube.items()
+            for stat in AGGREGATE_STATS
+        }
+        self._cube_year_idx = {
+            (region, int(year)): i
+            for region, frame in self._cube.items()
+            for i, year in enumerate(frame["Year"])
+        }
+        self._empty_cube = self._cube["all"].iloc[0:0]
+        # Becsült memóriaigény a mutatók kiürítéséhez (a tábla és a két nézet sorpozíciói)
+        self.memory_bytes = int(
+            self.df.memory_usage(deep=True).sum() + self._region_rows.nbytes + self._country_rows.nbytes
+        )
+
+    def year(self, year):
+        s = self._year_idx.get(year)
+        return self.df.iloc[s] if s is not None else self._empty
+
+    def year_span(self, year_from=None, year_to=None):
+        # A self.df év szerint rendezett, így egy évtartomány is egyetlen szelet
+        slices = [
+            s for y, s in self._year_idx.items()
+            if (year_from is None or y >= year_from) and (year_to is None or y <= year_to)
+        ]
+        if not slices:
+            return self._empty
+        return self.df.iloc[min(s.start for s in slices):max(s.stop for s in slices)]
+
+    def year_region(self, year, region):
+        if region in (None, "all"):
+            return self.year(year)
+        s = self._year_region_idx.get((region, year))
+        return self.df.take(self._region_rows[s]) if s is not None else self._empty
+
+    def region(self, region):
+        if region in (None, "all"):
+            return self.df
+        s = self._region_idx.get(region)
+        return self.df.take(self._region_rows[s]) if s is not None else self._empty
+
+    def country(self, country):
+        s = self._country_idx.get(country)
+        return self.df.take(self._country_rows[s]) if s is not None else self._empty
+
+    def countries_df(self, countries):
+        # Az eredeti CSV sorrendben fűzzük össze, hogy a színkiosztás ne függjön a kiválasztás sorrendjétől
+        slices = sorted(
+            (self._country_idx[c] for c in set(countries) if c in self._country_idx),
+            key=lambda s: s.start,
+        )
+        if not slices:
+            return self._empty
+        import numpy as np
+
+        return self.df.take(np.concatenate([self._country_rows[s] for s in slices]))
+
+    def aggregate(self, region=None):
+        # Évenként egy sor: Year + AGGREGATE_STATS oszlopok
+        return self._cube.get("all" if region is None else region, self._empty_cube)
+
+    def aggregate_series(self, region=None, stat="mean"):
+        # A line chartokhoz: Year + az érték oszlop a kért statisztikával
+        return self.aggregate(region)[["Year", stat]].rename(columns={stat: self.value})
+
+    def aggregate_value(self, region, year, stat):
+        cube = self.aggregate(region)
+        s = self._cube_year_idx.get(("all" if region is None else region, year))
+        if s is None:
+            return None
+        value = cube[stat].iat[s]
+        return value.item() if hasattr(value, "item") else value
+
+    def aggregate_extremes(self, region=None, stat="mean"):
+        return self._cube_extremes.get(("all" if region is None else region, stat))
+
+    def country_year(self, country, year):
+        dff = self.country(country)
+        return dff[dff["Year"] == year]
+
+    def rank(self, country, year):
+        # (világ helyezés, világ összes, régiós helyezés, régiós összes) vagy None
+        ranks = self._ranks.get((country, year))
+        return tuple(int(v) for v in ranks) if ranks is not None else None
+
+    def rank_history(self, countries, kind=WORLD_RANK):
+        history = self._rank_history[kind]
+        return history.reindex(list(countries)) if countries is not None else history
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Linuxon kívül csak a csúcsérték érhető el (macOS-en bájtban, máshol KiB-ban)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# A cache-elt oszlopokat (helyezések, típusok) előállító kód; változáskor a cache érvénytelen
+CACHE_SOURCE_FILES = ("cpidata.py", "npcache.py")
+_code_version = None
+
+
+def code_version():
+    global _code_version
+    if _code_version is None:
+        import pandas as pd
+
+        digest = hashlib.sha256(pd.__version__.encode())
+        root = os.path.dirname(os.path.abspath(__file__))
+        for name in CACHE_SOURCE_FILES:
+            with open(os.path.join(root, name), "rb") as f:
+                digest.update(f.read())
+        _code_version = digest.hexdigest()[:16]
+    return _code_version
+
+
+def cache_key(version, indicator):
+    # (család, kulcs): a család a mutató és a tárolt típusok sémája, ezen belül a régebbi
+    # bejegyzések törlődnek; a kulcs az adatverzió és a származtató kód verziója
+    family = f"{indicator.key.replace('.', '_')}-{'compact' if COMPACT_DTYPES else 'wide'}"
+    return family, f"{version}-{code_version()}"
+
+
+def load_data(path=None, use_cache=True, indicator=None):
+    indicator = indicator or INDICATORS[DEFAULT_INDICATOR]
+    path = path or indicator.path
+    start = time.perf_counter()
+    signature = file_signature(path)
+    # Egyszer olvassuk be a fájlt: a hash és a tábla ugyanabból a tartalomból készül.
+    # A séma is része a verziónak, hogy oszlopleképezés-változáskor a cache-ek érvénytelenek legyenek.
+    with open(path, "rb") as f:
+        raw = f.read()
+    version = hashlib.sha256(raw + indicator.fingerprint().encode("utf-8")).hexdigest()
+    df, extra = read_cache(path, *cache_key(version, indicator)) if use_cache else (None, None)
+    if df is not None:
+        data = CPIData(df, version=version, country_order=extra.get("country_order"), indicator=indicator)
+        source = "npy-cache"
+    else:
+        import pandas as pd
+
+        data = CPIData(pd.read_csv(io.BytesIO(raw)), version=version, indicator=indicator)
+        source = "csv"
+        if use_cache:
+            try:
+                write_cache(path, *cache_key(version, indicator), data.df, extra={"country_order": data.country_order})
+            except OSError:
+                logger.warning("Could not write the binary cache for %s", path, exc_info=True)
+    data.load_report = {
+        "source": source,
+        "load_seconds": round(time.perf_counter() - start, 4),
+        "rss_bytes": _rss_bytes(),
+        "memory_bytes": data.memory_bytes,
+    }
+    data.path = path
+    data.signature = signature
+    logger.info("Loaded %s (%s) from %s: %s", indicator.key, path, source, data.load_report)
+    return data
+
+
+# A betöltött mutatók snapshotjai, a legrégebben használt elöl. A callbackek egyszer kérik le
+# (get_data) és végig azt használják; újratöltéskor és kiürítéskor csak a referencia változik,
+# a már kiadott snapshot érintetlen marad.
+_snapshots = OrderedDict()
+_next_checks = {}
+# Mutatónként az előző ellenőrzéskor látott, a betöltöttől eltérő aláírás
+_pending_signatures = {}
+_reload_lock = threading.Lock()
+
+
+def get_data(indicator=None):
+    key = indicator or DEFAULT_INDICATOR
+    data = _snapshots.get(key)
+    if data is None:
+        return reload_data(indicator=key)
+    try:
+        _snapshots.move_to_end(key)
+    except KeyError:
+        # Közben egy másik szál kiürítette; a kezünkben lévő snapshot így is érvényes
+        pass
+    if RELOAD_CHECK_INTERVAL > 0 and time.monotonic() >= _next_checks.get(key, 0.0):
+        _next_checks[key] = time.monotonic() + RELOAD_CHECK_INTERVAL
+        try:
+            signature = file_signature(data.path)
+            if signature == data.signature:
+                _pending_signatures.pop(key, None)
+            elif _pending_signatures.get(key) != signature:
+                # Változott, de lehet, hogy még írják: a következő ellenőrzésig várunk
+                _pending_signatures[key] = signature
+            else:
+                _pending_signatures.pop(key, None)
+                return reload_data(indicator=key)
+        except Exception:
+            # Félig kiírt vagy hibás fájl: marad a régi snapshot
+            logger.exception("Reloading %s failed, keeping version %s", data.path, data.version)
+    return data
+
+
+def reload_data(path=None, force=False, indicator=None):
+    key = indicator or DEFAULT_INDICATOR
+    if key not in INDICATORS:
+        raise KeyError(f"Unknown indicator: {key}")
+    with _reload_lock:
+        current = _snapshots.get(key)
+        path = path or (current.path if current is not None else INDICATORS[key].path)
+        if current is not None and not force and file_signature(path) == current.signature:
+            return current
+        data = load_data(path, indicator=INDICATORS[key])
+        if current is not None and data.version == current.version and not force:
+            # Csak a fájl időbélyege változott: megtartjuk a régit, hogy a cache-ek érvényesek maradjanak
+            current.signature = data.signature
+            return current
+        _snapshots[key] = data
+        _snapshots.move_to_end(key)
+        _evict(keep=key)
+        if current is not None:
+            logger.info("Swapped %s data version %s -> %s", key, current.version, data.version)
+        return data
+
+
+def _evict(keep):
+    # A zár alatt hívjuk; az alapértelmezett és az épp betöltött mutató sosem ürül ki.
+    # A get_data zár nélkül sorol át (move_to_end), ezért másolaton iterálunk: az élő
+    # OrderedDict bejárása közbeni átsorolás RuntimeError-t adna.
+    while sum(d.memory_bytes for d in list(_snapshots.values())) > INDICATOR_MEMORY_LIMIT:
+        victim = next((k for k in list(_snapshots) if k not in (keep, DEFAULT_INDICATOR)), None)
+        if victim is None:
+            break
+        data = _snapshots.pop(victim)
+        _next_checks.pop(victim, None)
+        _pending_signatures.pop(victim, None)
+        logger.info("Evicted indicator %s (%d bytes)", victim, data.memory_bytes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPI data store utilities.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build-cache", help="convert the CSV to the memory-mapped .npy cache")
+    build.add_argument("--indicator", default=DEFAULT_INDICATOR, choices=sorted(INDICATORS))
+    build.add_argument("--path", default=None)
+    args = parser.parse_args()
+
+    if args.command == "build-cache":
+        indicator = INDICATORS[args.indicator]
+        csv_report = load_data(args.path, use_cache=False, indicator=indicator).load_report
+        # Ez írja a cache-t (ha még nincs), a következő betöltés már abból olvas
+        load_data(args.path, indicator=indicator)
+        cached_report = load_data(args.path, indicator=indicator).load_report
+        print(f"csv:       {csv_report}")
+        print(f"npy-cache: {cached_report}")
+
+
+if __name__ == "__main__":
+    main()
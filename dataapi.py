@@ -0,0 +1,252 @@
+import base64
+import hashlib
+import importlib.util
+import io
+import json
+import os
+
+from flask import Response, jsonify, request, stream_with_context
+
+from cpidata import INDICATORS, REGION_RANK, WORLD_RANK, get_data
+
+# Csak olvasható adat API a letöltő rendszereknek (a dashboard callbackjei helyett):
+#     GET /api/cpi?year=2024&region=ECA&iso3=HUN,AUT&format=json|csv|arrow&limit=&cursor=&indicator=
+#     GET /api/cpi/meta?indicator=
+# Az indicator paraméter nélkül az alapértelmezett mutató (CPI) adatai jönnek.
+# A szűrők különböző paraméterek között ÉS, egy paraméteren belül (vesszővel vagy ismételve)
+# VAGY kapcsolatban állnak. A sorrend mindig év, azon belül a CSV sorrendje.
+# A cursor az adatverzióhoz kötött eltolás: ha közben új adat töltődött be, 410 a válasz.
+API_DEFAULT_LIMIT = int(os.environ.get("CPI_API_DEFAULT_LIMIT", 1000))
+API_MAX_LIMIT = int(os.environ.get("CPI_API_MAX_LIMIT", 10000))
+CSV_CHUNK_ROWS = 2000
+# A pyarrow csak az első Arrow kérésnél töltődik be (gyors indulás, startup.py)
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+FORMATS = {
+    "json": "application/json",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+class APIError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _values(name):
+    # ?iso3=HUN,AUT és ?iso3=HUN&iso3=AUT ugyanaz; az országnevek csak ismételve (lehet bennük vessző)
+    values = request.args.getlist(name)
+    if name == "country":
+        return [v for v in values if v]
+    return [part.strip() for v in values for part in v.split(",") if part.strip()]
+
+
+def _int(name, value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise APIError(f"{name} must be an integer") from None
+
+
+def _data():
+    indicator = request.args.get("indicator") or None
+    if indicator is not None and indicator not in INDICATORS:
+        raise APIError(f"unknown indicator {indicator!r}", status=404)
+    return get_data(indicator)
+
+
+def _format():
+    name = request.args.get("format")
+    if name is None:
+        best = request.accept_mimetypes.best_match(list(FORMATS.values()), default=FORMATS["json"])
+        name = next(k for k, v in FORMATS.items() if v == best)
+    if name not in FORMATS:
+        raise APIError(f"format must be one of {', '.join(FORMATS)}")
+    if name == "arrow" and not HAS_PYARROW:
+        raise APIError("Arrow output needs pyarrow", status=406)
+    return name
+
+
+def _columns(data):
+    # A rangsor oszlopok belső segédoszlopok (cpidata), az API a CSV oszlopait adja
+    return [c for c in data.df.columns if c not in (WORLD_RANK, REGION_RANK)]
+
+
+def select_rows(data, years=(), year_from=None, year_to=None, regions=(), iso3=(), countries=()):
+    # A legszűkebb előre indexelt szeletből indulunk, a többi szűrő maszk
+    if countries or iso3:
+        names = set(countries) if countries else None
+        if iso3:
+            iso_names = {data.iso3_country[i.upper()] for i in iso3 if i.upper() in data.iso3_country}
+            names = iso_names if names is None else names & iso_names
+        dff = data.countries_df(names).sort_values("Year", kind="stable")
+    elif len(regions) == 1 and len(years) == 1:
+        dff = data.year_region(years[0], regions[0])
+    elif len(regions) == 1:
+        dff = data.region(regions[0])
+    elif len(years) == 1:
+        dff = data.year(years[0])
+    else:
+        dff = data.year_span(year_from, year_to)
+
+    mask = None
+    for column, allowed in (("Year", years), ("Region", regions)):
+        if allowed:
+            m = dff[column].isin(allowed)
+            mask = m if mask is None else mask & m
+    if year_from is not None:
+        m = dff["Year"] >= year_from
+        mask = m if mask is None else mask & m
+    if year_to is not None:
+        m = dff["Year"] <= year_to
+        mask = m if mask is None else mask & m
+    return dff if mask is None else dff[mask]
+
+
+def _encode_cursor(version, offset):
+    raw = f"{version[:16]}:{offset}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor, version):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        cursor_version, offset = raw.split(":")
+        offset = int(offset)
+    except (ValueError, UnicodeDecodeError):
+        raise APIError("invalid cursor") from None
+    if offset < 0:
+        raise APIError("invalid cursor")
+    if cursor_version != version[:16]:
+        raise APIError("the dataset changed since this cursor was issued, start again", status=410)
+    return offset
+
+
+def _etag(version, fmt):
+    args = sorted(request.args.items(multi=True))
+    key = json.dumps([version, fmt, args])
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def _public(page, columns):
+    # A kimenet a CSV típusait adja, nem a belső tömör típusokat (cpidata.compact_dtypes):
+    # kategória -> szöveg, kis egészek -> int64, float32 -> float64 a legrövidebb alakon át
+    # (különben a JSON-ban 3.2999999523 állna 3.3 helyett). Csak a kiadott lap bővül.
+    import pandas as pd
+
+    frame = page[columns]
+    wide = {}
+    for name, series in frame.items():
+        dtype = series.dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            wide[name] = series.astype("str")
+        elif pd.api.types.is_integer_dtype(dtype) and dtype.itemsize < 8:
+            wide[name] = series.astype("int64")
+        elif dtype == "float32":
+            wide[name] = series.astype("str").astype("float64")
+    return frame.assign(**wide) if wide else frame
+
+
+def _csv_stream(page, columns):
+    yield _public(page.iloc[0:0], columns).to_csv(index=False)
+    for start in range(0, len(page), CSV_CHUNK_ROWS):
+        yield _public(page.iloc[start:start + CSV_CHUNK_ROWS], columns).to_csv(index=False, header=False)
+
+
+def _arrow(page, columns):
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(_public(page, columns), preserve_index=False)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def cpi_rows():
+    data = _data()
+    fmt = _format()
+    etag = _etag(data.version, fmt)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    years = [_int("year", y) for y in _values("year")]
+    year_from = _int("from", request.args["from"]) if "from" in request.args else None
+    year_to = _int("to", request.args["to"]) if "to" in request.args else None
+    dff = select_rows(
+        data,
+        years=years,
+        year_from=year_from,
+        year_to=year_to,
+        regions=_values("region"),
+        iso3=_values("iso3"),
+        countries=_values("country"),
+    )
+
+    # JSON-nál alapból lapozunk, CSV/Arrow-nál alapból minden sor egyben jön
+    limit = request.args.get("limit")
+    if limit is not None:
+        limit = _int("limit", limit)
+        if limit < 1:
+            raise APIError("limit must be positive")
+    elif fmt == "json":
+        limit = API_DEFAULT_LIMIT
+    if fmt == "json":
+        limit = min(limit, API_MAX_LIMIT)
+    offset = _decode_cursor(request.args["cursor"], data.version) if request.args.get("cursor") else 0
+    end = len(dff) if limit is None else min(len(dff), offset + limit)
+    page = dff.iloc[offset:end]
+    next_cursor = _encode_cursor(data.version, end) if end < len(dff) else None
+    columns = _columns(data)
+
+    if fmt == "json":
+        meta = json.dumps({"version": data.version, "total": len(dff), "next_cursor": next_cursor})
+        body = meta[:-1] + ',"rows":' + _public(page, columns).to_json(orient="records", force_ascii=False) + "}"
+        response = Response(body, mimetype=FORMATS["json"])
+    elif fmt == "csv":
+        response = Response(stream_with_context(_csv_stream(page, columns)), mimetype=FORMATS["csv"])
+    else:
+        response = Response(_arrow(page, columns), mimetype=FORMATS["arrow"])
+
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Data-Version"] = data.version
+    response.headers["X-Total-Count"] = str(len(dff))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+
+def cpi_meta():
+    data = _data()
+    etag = _etag(data.version, "meta")
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    response = jsonify(
+        version=data.version,
+        indicator=data.key,
+        value_column=data.value,
+        indicators=[{"key": key, "label": i.label} for key, i in INDICATORS.items()],
+        columns=_columns(data),
+        years=data.years,
+        regions=data.regions,
+        countries=[{"country": c, "iso3": i} for i, c in sorted(data.iso3_country.items())],
+    )
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def register_data_api(server):
+    server.add_url_rule("/api/cpi", "cpi_rows", cpi_rows)
+    server.add_url_rule("/api/cpi/meta", "cpi_meta", cpi_meta)
+
+    @server.errorhandler(APIError)
+    def _api_error(error):
+        return jsonify(error=str(error)), error.status
@@ -0,0 +1,77 @@
+import argparse
+import logging
+import os
+import tempfile
+import urllib.request
+
+import pandas as pd
+
+from cpidata import DATA_PATH
+
+SNAPSHOT_URL = os.environ.get(
+    "CPI_SNAPSHOT_URL",
+    "https://raw.githubusercontent.com/plotly/Figure-Friday/refs/heads/main/2025/week-28/CPI2024.csv",
+)
+SNAPSHOT_PATH = os.environ.get("CPI_SNAPSHOT_PATH", "CPI2024.csv")
+REQUIRED_COLUMNS = ["Country / Territory", "ISO3", "Rank"]
+
+logger = logging.getLogger(__name__)
+
+
+def validate(df):
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Snapshot is missing columns: {', '.join(missing)}")
+    if df.empty:
+        raise ValueError("Snapshot has no rows")
+    if df["ISO3"].isna().any() or df["ISO3"].duplicated().any():
+        raise ValueError("Snapshot has missing or duplicate ISO3 codes")
+    return df
+
+
+def load_snapshot(path=None):
+    # A workerek csak helyi fájlt olvasnak; hálózatot csak a refresh parancs használ
+    path = path or SNAPSHOT_PATH
+    if os.path.exists(path):
+        return pd.read_csv(path)
+    logger.warning(
+        "CPI snapshot %s not found, using the latest year of %s. "
+        "Run `python datasource.py refresh` to create it.",
+        path,
+        DATA_PATH,
+    )
+    df = pd.read_csv(DATA_PATH)
+    return df[df["Year"] == df["Year"].max()].reset_index(drop=True)
+
+
+def refresh_snapshot(url=None, path=None, timeout=60):
+    url = url or SNAPSHOT_URL
+    path = os.path.abspath(path or SNAPSHOT_PATH)
+    # Ideiglenes fájl ugyanabban a könyvtárban, hogy az os.replace atomikus legyen
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp, urllib.request.urlopen(url, timeout=timeout) as response:
+            tmp.write(response.read())
+        df = validate(pd.read_csv(tmp_path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local CPI dataset snapshot.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    refresh = subparsers.add_parser("refresh", help="download, validate and replace the snapshot")
+    refresh.add_argument("--url", default=SNAPSHOT_URL)
+    refresh.add_argument("--path", default=SNAPSHOT_PATH)
+    args = parser.parse_args()
+
+    if args.command == "refresh":
+        df = refresh_snapshot(args.url, args.path)
+        print(f"Wrote {len(df)} rows to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import plotly.io as pio
+
+from compactfig import COMPACT_FIGURES, compact_figure
+from prerender import prerendered
+
+FIGURE_CACHE_MAX_ENTRIES = int(os.environ.get("FIGURE_CACHE_MAX_ENTRIES", 512))
+FIGURE_CACHE_MAX_BYTES = int(os.environ.get("FIGURE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+def normalize(value):
+    # A kulcs ne függjön a többes kiválasztás sorrendjétől
+    if isinstance(value, (list, tuple, set)):
+        return tuple(sorted({normalize(v) for v in value}, key=str))
+    return value
+
+
+def figure_key(name, *args):
+    return (name,) + tuple(normalize(a) for a in args)
+
+
+class FigureCache:
+    def __init__(self, max_entries=FIGURE_CACHE_MAX_ENTRIES, max_bytes=FIGURE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.compact = COMPACT_FIGURES
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.prerendered_hits = 0
+        # A prerender build ide gyűjti a felépített ábrákat (prerender.py)
+        self.recorder = None
+        # Szerializált méret a tömörítés előtt és után (minden felépített ábrára)
+        self.bytes_before = 0
+        self.bytes_after = 0
+
+    def get(self, key, build, version=None):
+        # A bejegyzések adatverziónként külön kulcson vannak: több mutató felváltva is
+        # használhatja a cache-t, a régi verziók ábrái pedig az LRU sorrendben kiesnek
+        entry_key = (version, key)
+        with self._lock:
+            payload = self._entries.get(entry_key)
+            if payload is not None:
+                self._entries.move_to_end(entry_key)
+                self.hits += 1
+                return json.loads(payload)
+
+        # Találat: memóriából (hits) vagy a prerender artifactból (prerendered_hits);
+        # miss csak az, amit ténylegesen fel kell építeni
+        payload = None
+        if self.recorder is None:
+            payload = prerendered.get(key, version, self.compact)
+        if payload is not None:
+            with self._lock:
+                self.prerendered_hits += 1
+        else:
+            with self._lock:
+                self.misses += 1
+            payload = pio.to_json(build(), validate=False)
+            size_before = len(payload)
+            if self.compact:
+                payload = json.dumps(compact_figure(json.loads(payload)), separators=(",", ":"))
+            with self._lock:
+                self.bytes_before += size_before
+                self.bytes_after += len(payload)
+            if self.recorder is not None:
+                self.recorder[key] = payload
+        with self._lock:
+            if entry_key not in self._entries:
+                self._entries[entry_key] = payload
+                self._bytes += len(payload)
+                self._evict()
+        return json.loads(payload)
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            _, payload = self._entries.popitem(last=False)
+            self._bytes -= len(payload)
+            self.evictions += 1
+
+    def _clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "prerendered_hits": self.prerendered_hits,
+                "bytes_before_compaction": self.bytes_before,
+                "bytes_after_compaction": self.bytes_after,
+            }
+
+
+figure_cache = FigureCache()
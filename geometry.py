@@ -0,0 +1,429 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+
+from flask import Response, abort, request, send_from_directory
+
+# Helyi, több felbontású országhatárok a choropleth térképekhez (CDN nélkül is működik).
+# A build parancs egy forrás GeoJSON-ból (pl. Natural Earth admin-0 countries) közös
+# topológiát épít: a szomszédos országok közös határszakasza egyetlen ív, amit szintenként
+# egyszer egyszerűsítünk, így nem keletkeznek rések és átfedések. Kimenet az assets/geo-ba:
+#
+#     countries-<szint>.geojson   országonkénti feature-ök (id = ISO3), szintenként
+#     world_110m.json, world_50m.json   TopoJSON a plotly.js alaptérképéhez (topojsonURL=/geo/)
+#
+#     python geometry.py build ne_10m_admin_0_countries.geojson
+#
+# Futáskor a térkép trace geojson-ja egy /geo/<szint>.geojson?iso3=... URL: a böngésző csak
+# az aktuális kiválasztás országait tölti le, a nagyításnak megfelelő szinten (világ, régió,
+# egy ország). Ha a fájlok hiányoznak, marad a Plotly beépített (CDN-ről töltött) térképe.
+GEO_ENABLED = os.environ.get("CPI_LOCAL_GEOMETRY", "1") == "1"
+GEO_DIR = os.environ.get(
+    "CPI_GEO_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "geo")
+)
+# Szintenként: egyszerűsítési tolerancia és minimális sokszögterület fokban, kimeneti tizedesjegyek,
+# és ha a szintből plotly.js alaptérkép is készül, annak neve
+LEVELS = {
+    "world": {"tolerance": 0.1, "min_area": 0.05, "digits": 2, "topojson": "world_110m"},
+    "region": {"tolerance": 0.02, "min_area": 0.002, "digits": 3, "topojson": "world_50m"},
+    "country": {"tolerance": 0.002, "min_area": 0.0, "digits": 4, "topojson": None},
+}
+TOPOJSON_NAMES = {spec["topojson"] for spec in LEVELS.values() if spec["topojson"]}
+# A plotly.js alaptérkép rétegei (a tó, folyó, óceán és partvonal rétegek üresek)
+TOPOJSON_LAYERS = ("land", "ocean", "lakes", "rivers", "coastlines", "countries", "subunits")
+# A topológia ezen a rácson épül (pont / fok)
+QUANTIZATION = 10000
+# A forrás feature-ök ISO3 kódja az első létező tulajdonságból (Natural Earth: ISO_A3_EH)
+ID_PROPERTIES = ("ISO_A3_EH", "ISO_A3", "ADM0_A3", "iso_a3", "ISO3", "id")
+NAME_PROPERTIES = ("NAME", "ADMIN", "name")
+
+
+# --- Build: topológia, ívenkénti egyszerűsítés ---
+def _feature_id(feature):
+    props = feature.get("properties") or {}
+    for key in ID_PROPERTIES:
+        value = props.get(key, feature.get("id") if key == "id" else None)
+        if isinstance(value, str) and len(value) == 3 and value.isalpha():
+            return value.upper()
+    return None
+
+
+def _polygons(geometry):
+    if geometry is None:
+        return []
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"]]
+    if geometry["type"] == "MultiPolygon":
+        return geometry["coordinates"]
+    return []
+
+
+def _quantize(ring):
+    points = []
+    for lon, lat, *_ in ring:
+        point = (round(lon * QUANTIZATION), round(lat * QUANTIZATION))
+        if not points or points[-1] != point:
+            points.append(point)
+    if len(points) > 1 and points[0] == points[-1]:
+        points.pop()
+    return points
+
+
+def _area(points):
+    # Előjeles terület (síkban, fok²-ben): pozitív, ha az óramutatóval ellentétes
+    total = 0
+    for (x1, y1), (x2, y2) in zip(points, points[1:] + points[:1]):
+        total += x1 * y2 - x2 * y1
+    return total / 2 / QUANTIZATION**2
+
+
+def _junctions(rings):
+    # Csomópont: ahol egy pont más szomszédokkal is előfordul (ott kezdődik/végződik egy közös határ)
+    neighbours = {}
+    junctions = set()
+    for ring in rings:
+        n = len(ring)
+        for i, point in enumerate(ring):
+            pair = frozenset((ring[i - 1], ring[(i + 1) % n]))
+            seen = neighbours.setdefault(point, pair)
+            if seen != pair:
+                junctions.add(point)
+    return junctions
+
+
+class Topology:
+    def __init__(self):
+        self.arcs = []
+        self._index = {}
+
+    def _arc(self, points):
+        # Ugyanaz az ív (akár fordított irányban) csak egyszer tárolódik; a ~i fordítottat jelent
+        key = tuple(points)
+        index = self._index.get(key)
+        if index is not None:
+            return index
+        index = self._index.get(key[::-1])
+        if index is not None:
+            return ~index
+        self.arcs.append(points)
+        self._index[key] = len(self.arcs) - 1
+        return len(self.arcs) - 1
+
+    def ring(self, points, junctions):
+        cuts = [i for i, p in enumerate(points) if p in junctions]
+        if not cuts:
+            # Zárt ív (pl. enklávé): kanonikus kezdőpont, hogy a két oldalról érkező gyűrű
+            # ugyanazt az ívet kapja (a fordított irány is ugyanabból a pontból indul)
+            start = points.index(min(points))
+            rotated = points[start:] + points[:start]
+            return [self._arc(rotated + [rotated[0]])]
+        rotated = points[cuts[0]:] + points[:cuts[0]]
+        cuts = [i - cuts[0] for i in cuts] + [len(points)]
+        rotated.append(rotated[0])
+        return [self._arc(rotated[a:b + 1]) for a, b in zip(cuts, cuts[1:])]
+
+
+def _simplify(points, tolerance):
+    # Douglas-Peucker, a végpontok (csomópontok) mindig megmaradnak
+    import numpy as np
+
+    if len(points) <= 2 or tolerance <= 0:
+        return points
+    xy = np.asarray(points, dtype=float)
+    keep = np.zeros(len(xy), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(xy) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last <= first + 1:
+            continue
+        inner = xy[first + 1:last]
+        a, b = xy[first], xy[last]
+        dx, dy = b - a
+        length = np.hypot(dx, dy)
+        if length == 0:
+            dist = np.hypot(inner[:, 0] - a[0], inner[:, 1] - a[1])
+        else:
+            dist = np.abs(dx * (inner[:, 1] - a[1]) - dy * (inner[:, 0] - a[0])) / length
+        k = int(np.argmax(dist))
+        if dist[k] > tolerance:
+            mid = first + 1 + k
+            keep[mid] = True
+            stack.append((first, mid))
+            stack.append((mid, last))
+    return [points[i] for i in np.flatnonzero(keep)]
+
+
+def _ring_points(refs, arcs):
+    points = []
+    for ref in refs:
+        arc = arcs[ref] if ref >= 0 else arcs[~ref][::-1]
+        points.extend(arc[1:] if points else arc)
+    return points
+
+
+def _valid(points):
+    # Zárt gyűrű legalább három különböző ponttal és nem nulla területtel
+    return len(set(points)) >= 3 and _area(points[:-1]) != 0
+
+
+def build_topology(source):
+    with open(source, encoding="utf-8") as f:
+        collection = json.load(f)
+    topology = Topology()
+    countries = {}
+    rings = []
+    for feature in collection.get("features", []):
+        iso3 = _feature_id(feature)
+        if iso3 is None:
+            continue
+        country = countries.setdefault(iso3, {"name": iso3, "polygons": []})
+        props = feature.get("properties") or {}
+        country["name"] = next((props[k] for k in NAME_PROPERTIES if props.get(k)), country["name"])
+        for polygon in _polygons(feature.get("geometry")):
+            quantized = [r for r in (_quantize(ring) for ring in polygon) if len(r) >= 3]
+            if quantized:
+                country["polygons"].append(quantized)
+                rings.extend(quantized)
+    junctions = _junctions(rings)
+    for country in countries.values():
+        country["polygons"] = [
+            {"area": abs(_area(polygon[0])), "rings": [topology.ring(r, junctions) for r in polygon]}
+            for polygon in country["polygons"]
+        ]
+    return topology, countries
+
+
+def simplify_level(topology, countries, tolerance, min_area):
+    tolerance_q = tolerance * QUANTIZATION
+    arcs = [_simplify(arc, tolerance_q) for arc in topology.arcs]
+
+    def polygons(country):
+        kept = []
+        largest = max(country["polygons"], key=lambda p: p["area"])
+        for polygon in country["polygons"]:
+            if polygon is not largest and polygon["area"] < min_area:
+                continue
+            outer, *holes = polygon["rings"]
+            if not _valid(_ring_points(outer, arcs)):
+                continue
+            kept.append([outer] + [h for h in holes if _valid(_ring_points(h, arcs))])
+        return kept
+
+    # Ha egy ország teljesen eltűnne, a legnagyobb sokszöge íveit nem egyszerűsítjük
+    # (a szomszéd ugyanazt az ívet használja, így a határ továbbra is közös marad)
+    for country in countries.values():
+        if country["polygons"] and not polygons(country):
+            largest = max(country["polygons"], key=lambda p: p["area"])
+            for ring in largest["rings"]:
+                for ref in ring:
+                    index = ref if ref >= 0 else ~ref
+                    arcs[index] = topology.arcs[index]
+    return arcs, {iso3: polygons(country) for iso3, country in countries.items() if country["polygons"]}
+
+
+def _oriented(refs, arcs, exterior):
+    # d3-geo (plotly.js) gömbi konvenció: a külső gyűrű az óramutató járásával megegyező,
+    # a lyuk ellentétes; megfordítva az ívek sorrendje és iránya is fordul
+    clockwise = _area(_ring_points(refs, arcs)[:-1]) < 0
+    return list(refs) if clockwise == exterior else [~ref for ref in reversed(refs)]
+
+
+def level_geojson(arcs, shapes, names, digits):
+    features = []
+    for iso3, polygons in sorted(shapes.items()):
+        coordinates = [
+            [
+                [[round(x / QUANTIZATION, digits), round(y / QUANTIZATION, digits)]
+                 for x, y in _ring_points(_oriented(ring, arcs, i == 0), arcs)]
+                for i, ring in enumerate(polygon)
+            ]
+            for polygon in polygons
+        ]
+        geometry = (
+            {"type": "Polygon", "coordinates": coordinates[0]}
+            if len(coordinates) == 1
+            else {"type": "MultiPolygon", "coordinates": coordinates}
+        )
+        features.append({"type": "Feature", "id": iso3, "properties": {"name": names[iso3]}, "geometry": geometry})
+    return {"type": "FeatureCollection", "features": features}
+
+
+def level_topojson(arcs, shapes):
+    # A plotly.js alaptérkép rétegei közül a "countries" és a "land" tartalmas; a land itt az
+    # országok uniója helyett maguk az országok (kitöltve ugyanúgy néznek ki)
+    geometries = []
+    for iso3, polygons in sorted(shapes.items()):
+        refs = [[_oriented(ring, arcs, i == 0) for i, ring in enumerate(polygon)] for polygon in polygons]
+        geometries.append(
+            {"type": "Polygon", "id": iso3, "arcs": refs[0]}
+            if len(refs) == 1
+            else {"type": "MultiPolygon", "id": iso3, "arcs": refs}
+        )
+    encoded = []
+    for arc in arcs:
+        delta = [list(arc[0])] + [[x2 - x1, y2 - y1] for (x1, y1), (x2, y2) in zip(arc, arc[1:])]
+        encoded.append(delta)
+    collection = {"type": "GeometryCollection", "geometries": geometries}
+    # A plotly.js minden bekapcsolt réteghez (geo.show*) a saját objektumát keresi
+    objects = {name: {"type": "GeometryCollection", "geometries": []} for name in TOPOJSON_LAYERS}
+    objects.update(countries=collection, land=collection)
+    return {
+        "type": "Topology",
+        "transform": {"scale": [1 / QUANTIZATION, 1 / QUANTIZATION], "translate": [0, 0]},
+        "objects": objects,
+        "arcs": encoded,
+    }
+
+
+def _write_json(path, value):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(value, f, separators=(",", ":"))
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+
+def build(source, output=GEO_DIR):
+    topology, countries = build_topology(source)
+    names = {iso3: country["name"] for iso3, country in countries.items()}
+    os.makedirs(output, exist_ok=True)
+    report = {"countries": len(countries), "arcs": len(topology.arcs), "levels": {}}
+    for level, spec in LEVELS.items():
+        arcs, shapes = simplify_level(topology, countries, spec["tolerance"], spec["min_area"])
+        size = _write_json(
+            os.path.join(output, f"countries-{level}.geojson"),
+            level_geojson(arcs, shapes, names, spec["digits"]),
+        )
+        level_report = {
+            "points": sum(len(a) for a in arcs),
+            "geojson_bytes": size,
+        }
+        if spec["topojson"]:
+            level_report["topojson_bytes"] = _write_json(
+                os.path.join(output, f"{spec['topojson']}.json"), level_topojson(arcs, shapes)
+            )
+        report["levels"][level] = level_report
+    return report
+
+
+# --- Futás: a kiválasztás országai a kért szinten ---
+class CountryShapes:
+    def __init__(self, directory=GEO_DIR):
+        self.directory = directory
+        self._levels = {}
+        self._available = None
+        self._lock = threading.Lock()
+
+    def path(self, level):
+        return os.path.join(self.directory, f"countries-{level}.geojson")
+
+    def available(self):
+        if self._available is None:
+            self._available = GEO_ENABLED and all(os.path.exists(self.path(level)) for level in LEVELS)
+        return self._available
+
+    def _level(self, level):
+        with self._lock:
+            entry = self._levels.get(level)
+        if entry is None:
+            with open(self.path(level), "rb") as f:
+                raw = f.read()
+            # Feature-önként előre szerializálva: egy részhalmaz csak összefűzés
+            features = {
+                feature["id"]: json.dumps(feature, separators=(",", ":"))
+                for feature in json.loads(raw)["features"]
+            }
+            entry = (hashlib.sha256(raw).hexdigest()[:12], features)
+            with self._lock:
+                self._levels[level] = entry
+        return entry
+
+    def version(self, level):
+        return self._level(level)[0]
+
+    def fingerprint(self):
+        if not self.available():
+            return "builtin"
+        return ",".join(self.version(level) for level in LEVELS)
+
+    def url(self, level, iso3):
+        codes = sorted({c for c in iso3 if isinstance(c, str)})
+        return f"/geo/{level}.geojson?v={self.version(level)}&iso3={','.join(codes)}"
+
+    def feature_collection(self, level, iso3):
+        features = self._level(level)[1]
+        parts = [features[c] for c in sorted(set(iso3)) if c in features]
+        return '{"type":"FeatureCollection","features":[' + ",".join(parts) + "]}"
+
+
+country_shapes = CountryShapes()
+
+
+def map_geometry(level, iso3):
+    # px.choropleth paraméterek a helyi geometriához; üres, ha nincs (marad a beépített világtérkép)
+    if not country_shapes.available():
+        return {}
+    return {"geojson": country_shapes.url(level, iso3), "featureidkey": "id"}
+
+
+def apply_map_geometry(fig, geometry, level):
+    # Nagyításnál az alaptérkép (szárazföld) is a finomabb TopoJSON-ból jön
+    if geometry and level != "world":
+        fig.update_geos(resolution=50)
+
+
+def map_graph_config(config):
+    # A plotly.js az alaptérkép TopoJSON-ját is innen tölti a CDN helyett
+    if not country_shapes.available():
+        return config
+    return dict(config, topojsonURL="/geo/")
+
+
+def country_geometry(level):
+    if level not in LEVELS or not country_shapes.available():
+        abort(404)
+    codes = [part.strip().upper() for v in request.args.getlist("iso3") for part in v.split(",") if part.strip()]
+    version = country_shapes.version(level)
+    etag = hashlib.sha256(f"{version}:{','.join(sorted(set(codes)))}".encode()).hexdigest()[:32]
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(country_shapes.feature_collection(level, codes), mimetype="application/json")
+    response.set_etag(etag)
+    # A verziózott URL tartalma sosem változik
+    response.headers["Cache-Control"] = (
+        "public, max-age=31536000, immutable" if request.args.get("v") == version else "no-cache"
+    )
+    return response
+
+
+def base_topojson(name):
+    if name not in TOPOJSON_NAMES or not country_shapes.available():
+        abort(404)
+    response = send_from_directory(country_shapes.directory, f"{name}.json", max_age=0)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def register_geometry(server):
+    server.add_url_rule("/geo/<level>.geojson", "country_geometry", country_geometry)
+    server.add_url_rule("/geo/<name>.json", "base_topojson", base_topojson)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the multi-resolution country geometry assets.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_parser = sub.add_parser("build", help="simplify a source GeoJSON into assets/geo")
+    build_parser.add_argument("source", help="country polygons GeoJSON (e.g. Natural Earth admin-0)")
+    build_parser.add_argument("--output", default=GEO_DIR, help="output directory")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(json.dumps(build(args.source, args.output), indent=1))
+
+
+if __name__ == "__main__":
+    main()
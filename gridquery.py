@@ -0,0 +1,79 @@
+# AG Grid szűrőmodell -> pandas maszk
+_TEXT_OPS = {
+    "contains": lambda s, v: s.str.contains(v, case=False, regex=False),
+    "notContains": lambda s, v: ~s.str.contains(v, case=False, regex=False),
+    "equals": lambda s, v: s.str.lower() == v.lower(),
+    "notEqual": lambda s, v: s.str.lower() != v.lower(),
+    "startsWith": lambda s, v: s.str.lower().str.startswith(v.lower()),
+    "endsWith": lambda s, v: s.str.lower().str.endswith(v.lower()),
+}
+_NUMBER_OPS = {
+    "equals": lambda s, v: s == v,
+    "notEqual": lambda s, v: s != v,
+    "lessThan": lambda s, v: s < v,
+    "lessThanOrEqual": lambda s, v: s <= v,
+    "greaterThan": lambda s, v: s > v,
+    "greaterThanOrEqual": lambda s, v: s >= v,
+}
+
+
+def _condition_mask(series, condition):
+    op = condition.get("type")
+    if op == "blank":
+        return series.isna()
+    if op == "notBlank":
+        return series.notna()
+    value = condition.get("filter")
+    if value is None:
+        import pandas as pd
+
+        return pd.Series(True, index=series.index)
+    if condition.get("filterType") == "number":
+        if op == "inRange":
+            return series.between(value, condition.get("filterTo"))
+        return _NUMBER_OPS.get(op, _NUMBER_OPS["equals"])(series, value)
+    return _TEXT_OPS.get(op, _TEXT_OPS["contains"])(series.astype(str), str(value))
+
+
+def apply_filter_model(dff, filter_model):
+    if not filter_model:
+        return dff
+    # A pandas csak szűréskor kell, importja nem lassítja az indulást (startup.py)
+    import pandas as pd
+
+    mask = pd.Series(True, index=dff.index)
+    for column, model in filter_model.items():
+        if column not in dff.columns:
+            continue
+        if "conditions" in model:
+            masks = [
+                _condition_mask(dff[column], dict(c, filterType=model.get("filterType")))
+                for c in model["conditions"]
+            ]
+            combined = masks[0]
+            for m in masks[1:]:
+                combined = combined | m if model.get("operator") == "OR" else combined & m
+        else:
+            combined = _condition_mask(dff[column], model)
+        mask &= combined
+    return dff[mask]
+
+
+def apply_sort_model(dff, sort_model):
+    sort_model = [s for s in sort_model or [] if s.get("colId") in dff.columns]
+    if not sort_model:
+        return dff
+    return dff.sort_values(
+        [s["colId"] for s in sort_model],
+        ascending=[s.get("sort") != "desc" for s in sort_model],
+        kind="stable",
+    )
+
+
+def get_rows(dff, request):
+    # Infinite row model: szűrés, rendezés, majd csak a kért blokk megy vissza
+    request = request or {}
+    dff = apply_sort_model(apply_filter_model(dff, request.get("filterModel")), request.get("sortModel"))
+    start = request.get("startRow", 0)
+    end = request.get("endRow", start + 100)
+    return {"rowData": dff.iloc[start:end].to_dict("records"), "rowCount": len(dff)}
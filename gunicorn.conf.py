@@ -0,0 +1,84 @@
+import gc
+import multiprocessing
+import os
+
+# Gunicorn beállítások (a gunicorn a munkakönyvtárból automatikusan betölti):
+#     gunicorn app:server
+#
+# A preload miatt a master egyszer importálja a pandas/Plotly/Dash modulokat, betölti az
+# adatkészletet és felépíti az indexeket (cpidata), a workerek ezt fork után copy-on-write
+# osztják meg. A numerikus oszlopok a .cpi-cache npy fájlokból memory-mappel jönnek, azokon
+# a page cache-en keresztül osztoznak. A CPIData snapshot csak olvasható, az újratöltés
+# referenciacserével történik (cpidata.reload_data), a figure cache és a metrikák zárral
+# védettek, így a gthread worker szálai is biztonságosan használják.
+#
+# Környezeti változók:
+#     PORT                  figyelt port (Heroku), alapértelmezés 8000
+#     CPI_WORKER_CLASS      "sync" (alapértelmezés) vagy "gthread"
+#     WEB_CONCURRENCY       workerek száma; alapból sync: 2 * magok + 1, gthread: magok + 1
+#     CPI_WORKER_THREADS    szálak workerenként gthread esetén, alapértelmezés 4
+#     CPI_WORKER_TIMEOUT    másodperc, alapértelmezés 60
+#     CPI_PRELOAD           "0": preload kikapcsolása (összehasonlító méréshez)
+#     CPI_FAST_START        "1": az adat a workerekben háttérszálon töltődik (startup.py)
+#
+# Mérés: 1 mag, Python 3.11, pandas 3, Dash 4, vegyes callback terhelés (térkép, line chart,
+# KPI panel; régió x év), 8 párhuzamos kliens, 40 s bemelegítés után 15 s, meleg figure cache.
+# Memória workerenként: RSS, PSS (megosztott lapok arányosan) és USS (csak a workeré).
+#
+#     beállítás                         RSS      PSS      USS     kérés/s
+#     sync, 3 worker, preload          131 MB    66 MB    45 MB     205
+#     sync, 3 worker, preload nélkül   136 MB    87 MB    70 MB     217
+#     gthread, 2 worker x 4 szál       140 MB    82 MB    53 MB     259
+#     sync, 1 worker                   132 MB    88 MB    46 MB     281
+#     gthread, 1 worker x 4 szál       138 MB    94 MB    51 MB     253
+#
+# Preloaddal workerenként ~25 MB-tal kevesebb saját memória; a maradék főleg a workerenkénti
+# figure cache és a callbackek közben foglalt memória. Egy magon több worker nem ad több
+# áteresztőképességet (a cache-ek workerenként melegszenek), több magon várhatóan a magok
+# számával skálázódik (ezt itt nem mértük). Lassú (cache miss) callbackeknél a gthread nem
+# blokkol egy egész workert.
+
+
+def _cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = os.environ.get("CPI_WORKER_CLASS", "sync")
+if worker_class == "gthread":
+    threads = int(os.environ.get("CPI_WORKER_THREADS", 4))
+    workers = int(os.environ.get("WEB_CONCURRENCY", _cores() + 1))
+else:
+    workers = int(os.environ.get("WEB_CONCURRENCY", 2 * _cores() + 1))
+timeout = int(os.environ.get("CPI_WORKER_TIMEOUT", 60))
+preload_app = os.environ.get("CPI_PRELOAD", "1") == "1"
+accesslog = "-"
+
+
+def when_ready(server):
+    # A masterben töltjük be az adatot, hogy a workerek már a kész snapshotot örököljék
+    from cpidata import get_data
+    from startup import FAST_START, warm_up
+
+    if not FAST_START:
+        warm_up(log=server.log.info)
+        data = get_data()
+        server.log.info(
+            "CPI data %s loaded from %s in %.3fs",
+            data.version[:12],
+            data.load_report["source"],
+            data.load_report["load_seconds"],
+        )
+    # A fork előtti objektumok kikerülnek a GC-ből, így a gyűjtés nem írja át a megosztott lapokat
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    # Gyors indulás: a worker azonnal fogad kéréseket, az adat háttérben töltődik
+    from startup import FAST_START, warm_up
+
+    if FAST_START:
+        warm_up(background=True, log=worker.log.info)
@@ -0,0 +1,144 @@
+import gzip
+import hashlib
+import os
+import threading
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Tömörítés és HTTP cache fejlécek a Dash szerverhez:
+# - gzip/brotli a megadott content type-okra egy méretküszöb felett,
+# - a verziózott statikus fájlok (component suites, ?m= assets) egy évig cache-elhetők,
+#   az assets ETag-je a tartalom hash-e,
+# - a callback válaszok és a /_dash-layout, /_dash-dependencies ETag-et kapnak a válasz
+#   tartalmából; egyező If-None-Match esetén 304 megy vissza üres törzzsel.
+#   A POST callbackekhez a böngésző nem küld If-None-Match-et, ezt az assets/etag.js teszi meg.
+COMPRESS_ENABLED = os.environ.get("CPI_COMPRESS", "1") == "1"
+COMPRESS_MIN_BYTES = int(os.environ.get("CPI_COMPRESS_MIN_BYTES", 500))
+COMPRESS_TYPES = set(
+    os.environ.get(
+        "CPI_COMPRESS_TYPES",
+        "text/html,text/css,text/plain,text/javascript,application/javascript,application/json,image/svg+xml",
+    ).split(",")
+)
+GZIP_LEVEL = int(os.environ.get("CPI_GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("CPI_BROTLI_QUALITY", 5))
+# A verziózott statikus fájlok tömörített változatát megtartjuk (véges számú fájl)
+STATIC_CACHE_MAX_ENTRIES = 256
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+CALLBACK_ETAGS = os.environ.get("CPI_CALLBACK_ETAGS", "1") == "1"
+
+
+def _encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def _compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+_static = {}
+_static_lock = threading.Lock()
+
+
+def _static_entry(key, build):
+    with _static_lock:
+        value = _static.get(key)
+    if value is None:
+        value = build()
+        with _static_lock:
+            if len(_static) >= STATIC_CACHE_MAX_ENTRIES:
+                _static.clear()
+            _static[key] = value
+    return value
+
+
+def _not_modified(response, etag):
+    response.set_etag(etag)
+    if request.if_none_match.contains_weak(etag):
+        response.status_code = 304
+        response.set_data(b"")
+        response.headers.pop("Content-Type", None)
+        return True
+    return False
+
+
+def _compress_response(response, static):
+    if (
+        response.mimetype not in COMPRESS_TYPES
+        or "Content-Encoding" in response.headers
+        or response.is_streamed
+    ):
+        return
+    response.vary.add("Accept-Encoding")
+    encoding = _encoding()
+    if encoding is None:
+        return
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return
+    if static:
+        key = ("body", request.full_path, response.headers.get("ETag"), encoding)
+        body = _static_entry(key, lambda: _compress(data, encoding))
+    else:
+        body = _compress(data, encoding)
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    # A tömörített törzs más bájtsorozat: a validátor gyenge lesz, a 304 így is működik
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def register_http_caching(server):
+    @server.after_request
+    def _cache_headers(response):
+        if response.status_code != 200:
+            return response
+        path = request.path
+        suite = "/_dash-component-suites/" in path
+        asset = "/assets/" in path
+
+        if suite or asset:
+            # A send_file válasz fájl-iterátor; pufferelve tömöríthető és hash-elhető
+            response.direct_passthrough = False
+            response.make_sequence()
+            versioned = suite or "m" in request.args
+            response.headers["Cache-Control"] = (
+                f"public, max-age={STATIC_MAX_AGE}, immutable" if versioned else "no-cache"
+            )
+            if asset:
+                etag = _static_entry(
+                    ("etag", path, response.headers.get("ETag")),
+                    lambda: _content_hash(response.get_data()),
+                )
+                if _not_modified(response, etag):
+                    return response
+        elif CALLBACK_ETAGS and (
+            (request.method == "POST" and path.endswith("_dash-update-component"))
+            or (request.method == "GET" and path.endswith(("_dash-layout", "_dash-dependencies")))
+        ):
+            # A callbackek a bemeneteik és az adat snapshot tiszta függvényei
+            response.headers["Cache-Control"] = "no-cache"
+            if _not_modified(response, _content_hash(response.get_data())):
+                return response
+
+        if COMPRESS_ENABLED:
+            _compress_response(response, suite or asset)
+        return response
@@ -0,0 +1,86 @@
+import functools
+import logging
+import os
+
+from cpidata import get_data
+
+try:
+    import diskcache
+    from dash import DiskcacheManager
+except ImportError:
+    diskcache = None
+
+# Háttérben futó callbackek helyi, lemezes job managerrel (dash[diskcache]): a web worker
+# csak elindítja a jobot egy külön folyamatban, a böngésző pedig pollozza az eredményt.
+# Ha a felhasználó közben újra indítja ugyanazt a callbacket, a Dash a régi jobot leállítja
+# (oldJob). Az eredmények a bemenetek és a callback által olvasott mutató adatverziója szerint
+# cache-elődnek, így egy másik mutató újratöltése nem érvényteleníti őket.
+# diskcache nélkül a callbackek szinkron futnak, mint eddig.
+BACKGROUND_CALLBACKS = os.environ.get("CPI_BACKGROUND_CALLBACKS", "1") == "1"
+JOBS_DIR = os.environ.get("CPI_JOBS_DIR", ".cpi-jobs")
+# Ennyi másodperc után törlődik a nem olvasott eredmény
+JOB_RESULT_EXPIRE = int(os.environ.get("CPI_JOB_RESULT_EXPIRE", 600))
+# A böngésző ilyen gyakran kérdezi le a job állapotát (ms)
+JOB_POLL_INTERVAL = int(os.environ.get("CPI_JOB_POLL_INTERVAL", 500))
+
+logger = logging.getLogger(__name__)
+
+
+def indicator_version():
+    # A job indításakor a kérés kontextusában fut: a mutatóválasztó értéke a callback bemenetei
+    # vagy állapotai közül, ennek hiányában a callback az alapértelmezett mutatót olvassa
+    from dash import callback_context
+
+    values = {**callback_context.states, **callback_context.inputs}
+    return get_data(values.get("indicator-select.value")).version
+
+
+def create_manager():
+    if not BACKGROUND_CALLBACKS:
+        return None
+    if diskcache is None:
+        logger.info("diskcache is not installed, background callbacks run synchronously")
+        return None
+    return DiskcacheManager(
+        diskcache.Cache(JOBS_DIR),
+        cache_by=[indicator_version],
+        expire=JOB_RESULT_EXPIRE,
+    )
+
+
+manager = create_manager()
+
+
+def background_callback(app, *dependencies, progress=None, running=None, **kwargs):
+    # A függvény set_progress kulcsszavas paramétert kap (szinkron módban None), így
+    # közvetlenül is hívható marad (bench.py). A functools.wraps miatt a Dash a job
+    # cache kulcsához az eredeti függvény forrását használja.
+    def decorator(func):
+        if manager is None:
+            app.callback(*dependencies, **kwargs)(func)
+            return func
+
+        @functools.wraps(func)
+        def run(*args):
+            if progress is None:
+                return func(*args)
+            set_progress, *args = args
+            return func(*args, set_progress=set_progress)
+
+        app.callback(
+            *dependencies,
+            background=True,
+            manager=manager,
+            interval=JOB_POLL_INTERVAL,
+            progress=progress,
+            running=running,
+            **kwargs,
+        )(run)
+        return func
+
+    return decorator
+
+
+def report(set_progress, step, total):
+    if set_progress is not None:
+        set_progress((step, total))
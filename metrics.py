@@ -0,0 +1,147 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from flask import Response, abort, g, request
+
+from figcache import figure_cache
+
+# Callbackenkénti metrikák a Dash _dash-update-component kérésekről, Prometheus szöveges formátumban.
+# Gunicorn alatt minden worker a saját számlálóit látja.
+ENABLED = os.environ.get("CPI_METRICS", "1") == "1"
+METRICS_LOCAL_ONLY = os.environ.get("CPI_METRICS_LOCAL_ONLY", "1") == "1"
+SLOW_CALLBACK_SECONDS = float(os.environ.get("CPI_SLOW_CALLBACK_SECONDS", 1.0))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000)
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+
+
+class CallbackMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.errors = {}
+        self.latency = {}
+        self.response_bytes = {}
+        self.counters = {}
+
+    def observe(self, output, seconds, size, error):
+        with self._lock:
+            self.requests[output] = self.requests.get(output, 0) + 1
+            if error:
+                self.errors[output] = self.errors.get(output, 0) + 1
+            self.latency.setdefault(output, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.response_bytes.setdefault(output, Histogram(SIZE_BUCKETS)).observe(size)
+
+    def inc(self, name, output, value=1):
+        with self._lock:
+            key = (name, output)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def render(self):
+        lines = []
+        with self._lock:
+            _counter(lines, "dash_callback_requests_total", "Callback requests.", self.requests)
+            _counter(lines, "dash_callback_errors_total", "Callback requests that failed (HTTP >= 500).", self.errors)
+            _histogram(lines, "dash_callback_duration_seconds", "Callback latency.", self.latency)
+            _histogram(lines, "dash_callback_response_bytes", "Callback response size.", self.response_bytes)
+            for name in sorted({name for name, _ in self.counters}):
+                _counter(
+                    lines,
+                    name,
+                    name.replace("_", " "),
+                    {output: v for (n, output), v in self.counters.items() if n == name},
+                )
+        stats = figure_cache.stats()
+        for key in ("hits", "misses", "evictions", "prerendered_hits", "bytes_before_compaction", "bytes_after_compaction"):
+            lines += [f"# TYPE figure_cache_{key}_total counter", f"figure_cache_{key}_total {stats[key]}"]
+        for key in ("entries", "bytes"):
+            lines += [f"# TYPE figure_cache_{key} gauge", f"figure_cache_{key} {stats[key]}"]
+        return "\n".join(lines) + "\n"
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _counter(lines, name, help_text, values):
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    for output, value in sorted(values.items()):
+        lines.append(f'{name}{{output="{_label(output)}"}} {value}')
+
+
+def _histogram(lines, name, help_text, histograms):
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for output, h in sorted(histograms.items()):
+        label = _label(output)
+        cumulative = 0
+        for bound, count in zip(h.buckets + (float("inf"),), h.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{name}_bucket{{output="{label}",le="{le}"}} {cumulative}')
+        lines.append(f'{name}_sum{{output="{label}"}} {h.sum}')
+        lines.append(f'{name}_count{{output="{label}"}} {cumulative}')
+
+
+callback_metrics = CallbackMetrics()
+
+
+def _is_callback_request():
+    return request.method == "POST" and request.path.endswith("_dash-update-component")
+
+
+def register_metrics(server):
+    @server.before_request
+    def _start_timer():
+        if ENABLED and _is_callback_request():
+            g.callback_start = time.perf_counter()
+
+    @server.after_request
+    def _record(response):
+        start = g.pop("callback_start", None)
+        if start is None:
+            return response
+        seconds = time.perf_counter() - start
+        body = request.get_json(silent=True) or {}
+        output = body.get("output", "unknown")
+        size = response.calculate_content_length() or 0
+        callback_metrics.observe(output, seconds, size, response.status_code >= 500)
+        if SLOW_CALLBACK_SECONDS and seconds >= SLOW_CALLBACK_SECONDS:
+            inputs = {
+                f"{i.get('id')}.{i.get('property')}": i.get("value")
+                for i in body.get("inputs", []) + body.get("state", [])
+                if isinstance(i, dict)
+            }
+            logger.warning(
+                "Slow callback %s: %.3fs, %d bytes, inputs=%s",
+                output,
+                seconds,
+                size,
+                json.dumps(inputs, default=str)[:2000],
+            )
+        return response
+
+    @server.route("/metrics")
+    def _metrics():
+        if METRICS_LOCAL_ONLY and request.remote_addr not in ("127.0.0.1", "::1"):
+            abort(404)
+        return Response(callback_metrics.render(), mimetype="text/plain; version=0.0.4")
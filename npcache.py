@@ -0,0 +1,115 @@
+import json
+import os
+import shutil
+import tempfile
+
+# Oszloponkénti .npy fájlok a CSV mellett; a numerikus oszlopokat memory-mappel
+# olvassuk, így a forkolt workerek a page cache-en keresztül osztoznak rajtuk.
+# Egy bejegyzés: <csv neve>.<család>.<kulcs>. A család (mutató és séma) minden változatához
+# csak a legújabb kulcs marad meg; a kulcs a CSV tartalmát és a származtató kódot azonosítja.
+CACHE_DIR_NAME = ".cpi-cache"
+
+
+def cache_dir(csv_path):
+    return os.path.join(os.path.dirname(os.path.abspath(csv_path)), CACHE_DIR_NAME)
+
+
+def _family_prefix(csv_path, family):
+    return f"{os.path.basename(csv_path)}.{family}."
+
+
+def _entry_dir(csv_path, family, source_hash):
+    return os.path.join(cache_dir(csv_path), _family_prefix(csv_path, family) + source_hash)
+
+
+def read_cache(csv_path, family, source_hash):
+    # None, ha nincs érvényes cache ehhez a CSV hash-hez
+    import numpy as np
+    import pandas as pd
+
+    entry = _entry_dir(csv_path, family, source_hash)
+    try:
+        with open(os.path.join(entry, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None, None
+    if meta.get("source_hash") != source_hash:
+        return None, None
+
+    columns = {}
+    for column in meta["columns"]:
+        values = np.load(os.path.join(entry, column["file"]), mmap_mode="r")
+        if column["kind"] == "category":
+            # A kódok már érvényesek (write_cache írta), így a memory-mappelt tömb másolás nélkül marad
+            values = pd.Series(pd.Categorical.from_codes(values, column["categories"], validate=False))
+        elif column["kind"] == "string":
+            values = pd.Series(
+                pd.Categorical.from_codes(values, column["categories"])
+            ).astype(column["dtype"])
+        columns[column["name"]] = values
+    return pd.DataFrame(columns, copy=False), meta.get("extra", {})
+
+
+def write_cache(csv_path, family, source_hash, df, extra=None):
+    import numpy as np
+    import pandas as pd
+
+    root = cache_dir(csv_path)
+    os.makedirs(root, exist_ok=True)
+    entry = _entry_dir(csv_path, family, source_hash)
+    if os.path.isdir(entry):
+        return entry
+
+    # Ideiglenes könyvtárba írunk, majd átnevezzük: olvasó sosem lát félkész cache-t
+    tmp = tempfile.mkdtemp(dir=root, prefix=".tmp-")
+    meta = {"source_hash": source_hash, "columns": [], "extra": extra or {}}
+    try:
+        for i, name in enumerate(df.columns):
+            series = df[name]
+            file_name = f"c{i}.npy"
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                # A kódok a kategória legkisebb egész típusában, a kategóriák sorrendje megmarad
+                np.save(os.path.join(tmp, file_name), series.cat.codes.to_numpy())
+                meta["columns"].append({
+                    "name": name,
+                    "kind": "category",
+                    "file": file_name,
+                    "categories": [str(c) for c in series.cat.categories],
+                })
+            elif pd.api.types.is_numeric_dtype(series.dtype):
+                np.save(os.path.join(tmp, file_name), series.to_numpy())
+                meta["columns"].append({"name": name, "kind": "numeric", "file": file_name})
+            else:
+                codes, categories = pd.factorize(series)
+                np.save(os.path.join(tmp, file_name), codes.astype(np.int32))
+                meta["columns"].append({
+                    "name": name,
+                    "kind": "string",
+                    "file": file_name,
+                    "dtype": str(series.dtype),
+                    "categories": [str(c) for c in categories],
+                })
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    try:
+        os.rename(tmp, entry)
+    except OSError:
+        # Egy másik worker közben már megírta
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.isdir(entry):
+            raise
+    _prune(csv_path, family, keep=entry)
+    return entry
+
+
+def _prune(csv_path, family, keep):
+    # Csak ugyanannak a családnak a régebbi bejegyzései (más mutató vagy séma cache-e marad)
+    root = cache_dir(csv_path)
+    prefix = _family_prefix(csv_path, family)
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name.startswith(prefix) and "." not in name[len(prefix):] and path != keep:
+            shutil.rmtree(path, ignore_errors=True)
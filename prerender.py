@@ -0,0 +1,225 @@
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+import plotly
+
+from cpidata import DATA_PATH
+from npcache import cache_dir
+
+# Előre renderelt ábrák: a build parancs az összes országfüggetlen bemenet-kombinációra
+# (év x régió x színskála x ranking mód) lefuttatja a callbackeket, és a figure cache-be
+# kerülő JSON-okat egy indexelt fájlba írja. Futáskor a figure cache cache miss esetén
+# innen olvas (figcache.py), és csak más kombinációnál (pl. országválasztás) számol élőben.
+#
+#     python prerender.py build
+#
+# Fájlformátum: MAGIC, 8 bájt index hossz, index JSON, majd zlib-bel tömörített JSON-ok.
+PRERENDER_ENABLED = os.environ.get("CPI_PRERENDER", "1") == "1"
+PRERENDER_PATH = os.environ.get(
+    "CPI_PRERENDER_PATH", os.path.join(cache_dir(DATA_PATH), "prerender.bin")
+)
+MAGIC = b"CPIPRE1\n"
+# Ha ezek közül bármelyik változik, a régi artifact nem használható
+SOURCE_FILES = ("app.py", "appnav.py", "cpidata.py", "compactfig.py", "figcache.py", "geometry.py")
+
+logger = logging.getLogger(__name__)
+
+
+def code_fingerprint():
+    from geometry import country_shapes
+
+    # A térképek a geometria verzióját is tartalmazzák (URL-ben)
+    digest = hashlib.sha256(plotly.__version__.encode())
+    digest.update(country_shapes.fingerprint().encode())
+    root = os.path.dirname(os.path.abspath(__file__))
+    for name in SOURCE_FILES:
+        with open(os.path.join(root, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def key_string(key):
+    return json.dumps(key, separators=(",", ":"), default=str)
+
+
+def write_artifact(path, payloads, meta):
+    entries = {}
+    blobs = []
+    offset = 0
+    for key, payload in payloads.items():
+        blob = zlib.compress(payload.encode("utf-8"), 9)
+        entries[key_string(key)] = [offset, len(blob)]
+        blobs.append(blob)
+        offset += len(blob)
+    index = json.dumps(dict(meta, entries=entries), separators=(",", ":")).encode("utf-8")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(index)))
+        f.write(index)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+
+class Artifact:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a prerender artifact")
+        (index_length,) = struct.unpack_from("<Q", self._map, len(MAGIC))
+        start = len(MAGIC) + 8
+        index = json.loads(self._map[start:start + index_length])
+        self._base = start + index_length
+        self.entries = index.pop("entries")
+        self.meta = index
+
+    def get(self, key):
+        entry = self.entries.get(key_string(key))
+        if entry is None:
+            return None
+        offset, length = entry
+        start = self._base + offset
+        return zlib.decompress(self._map[start:start + length]).decode("utf-8")
+
+
+class Prerendered:
+    # A megfelelő (adatverzió, kód, tömörítés) artifact lusta betöltése; a többi mutató
+    # verziójára None kerül a táblába, így mutatóváltáskor nem olvassuk újra a fájlt
+    def __init__(self, path=PRERENDER_PATH):
+        self.path = path
+        self._artifacts = {}
+        self._lock = threading.Lock()
+        self._fingerprint = None
+
+    def _load(self, version, compact):
+        if self._fingerprint is None:
+            self._fingerprint = code_fingerprint()
+        try:
+            artifact = Artifact(self.path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logger.exception("Cannot read prerender artifact %s", self.path)
+            return None
+        meta = artifact.meta
+        if (
+            meta.get("data_version") != version
+            or meta.get("code") != self._fingerprint
+            or meta.get("compact") != compact
+        ):
+            logger.info("Prerender artifact %s is stale, figures are built live", self.path)
+            return None
+        return artifact
+
+    def get(self, key, version, compact):
+        if not PRERENDER_ENABLED or version is None:
+            return None
+        with self._lock:
+            artifact_key = (version, compact)
+            if artifact_key not in self._artifacts:
+                if len(self._artifacts) >= 16:
+                    self._artifacts.clear()
+                self._artifacts[artifact_key] = self._load(version, compact)
+            artifact = self._artifacts[artifact_key]
+        return artifact.get(key) if artifact is not None else None
+
+
+prerendered = Prerendered()
+
+
+def _callbacks(quick=False):
+    # Az összes országfüggetlen callback hívás; a kulcsokat a callbackek maguk számolják
+    import app
+    import appnav
+    from cpidata import get_data
+
+    data = get_data()
+    regions = ["all"] + data.regions
+    scales = list(app.color_scales)
+    years = [data.min_year, data.latest_year] if quick else data.years
+    n_values = [10] if quick else list(range(5, 51, 5))
+
+    for region, scale in itertools.product(regions, scales):
+        for year in years:
+            yield "app.update_map", app.update_map, ([], region, year, scale)
+        yield "app.update_line_chart", app.update_line_chart, ([], region, scale)
+        yield "appnav.update_dashboard", appnav.update_dashboard, ("all", region, scale, None)
+        yield "appnav.update_ranking_page", appnav.update_ranking_page, (region, scale, "all", None)
+        for mode, n in itertools.product(["top", "bottom"], n_values):
+            yield "appnav.update_ranking_page", appnav.update_ranking_page, (region, scale, mode, n)
+
+
+def build(path=PRERENDER_PATH, quick=False):
+    from dash._callback_context import context_value
+    from dash._utils import AttributeDict
+
+    from cpidata import get_data
+    from figcache import figure_cache
+
+    # appnav.update_dashboard a callback_context-et is olvassa
+    context_value.set(AttributeDict(triggered_inputs=[{"prop_id": "region-select.value", "value": None}]))
+    start = time.perf_counter()
+    data = get_data()
+    figure_cache.clear()
+    figure_cache.recorder = {}
+    calls = {}
+    try:
+        for name, func, args in _callbacks(quick):
+            func(*args)
+            calls[name] = calls.get(name, 0) + 1
+        payloads = figure_cache.recorder
+    finally:
+        figure_cache.recorder = None
+    render_seconds = time.perf_counter() - start
+
+    size = write_artifact(
+        path,
+        payloads,
+        {
+            "data_version": data.version,
+            "code": code_fingerprint(),
+            "compact": figure_cache.compact,
+            "created": time.time(),
+        },
+    )
+    raw = sum(len(p.encode("utf-8")) for p in payloads.values())
+    return {
+        "path": path,
+        "figures": len(payloads),
+        "calls": calls,
+        "json_bytes": raw,
+        "artifact_bytes": size,
+        "build_seconds": round(time.perf_counter() - start, 3),
+        "render_seconds": round(render_seconds, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prerender the country-independent dashboard figures.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_parser = sub.add_parser("build", help="render all combinations into the artifact")
+    build_parser.add_argument("--output", default=PRERENDER_PATH, help="artifact path")
+    build_parser.add_argument("--quick", action="store_true", help="first/last year and n=10 only")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        report = build(args.output, quick=args.quick)
+        print(json.dumps(report, indent=1))
+
+
+if __name__ == "__main__":
+    main()
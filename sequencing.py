@@ -0,0 +1,110 @@
+import os
+import threading
+from collections import OrderedDict
+
+from flask import Response, g, request
+
+from metrics import callback_metrics
+
+# Elavult callback kérések kihagyása. A csúszka húzása vagy gyors kattintgatás sok kérést indít
+# ugyanarra a kimenetre, a Dash kliens ezekből csak az utolsó eredményét jeleníti meg.
+# - A bemenetek késleltetve mennek a szerverre (assets/debounce.js, INPUT_DEBOUNCE_MS).
+# - A kliens (assets/sequence.js) minden callback kéréshez munkamenet-azonosítót (böngészőfül)
+#   és növekvő sorszámot küld, kimenetenként egyszerre egy kérés fut, a közben érkezők közül
+#   csak a legújabb vár, a kihagyottak számát a következő kérés jelenti (X-Dash-Superseded).
+# - A szerver munkamenet x kimenet szerint sorba állítja a kéréseket: ha a várakozás alatt
+#   újabb sorszám érkezett, vagy a kérés régebbi a már látottnál, 204 (PreventUpdate) a válasz
+#   számolás nélkül. Gthread workernél a szálak közt várakozó kérések így kimaradnak; sync
+#   workernél a kliens oldali sorrendezés véd, a szerver a sorrendet ellenőrzi.
+# A kihagyott kérések a dash_callback_superseded_total metrikában látszanak (kimenetenként).
+SEQUENCING_ENABLED = os.environ.get("CPI_REQUEST_SEQUENCING", "1") == "1"
+INPUT_DEBOUNCE_MS = int(os.environ.get("CPI_INPUT_DEBOUNCE_MS", 250))
+# Ennyi munkamenet x kimenet sorszámát tartjuk workerenként (a legrégebben használtak esnek ki)
+MAX_SEQUENCES = 10000
+SUPERSEDED_METRIC = "dash_callback_superseded_total"
+
+
+class _Sequence:
+    def __init__(self):
+        self.latest = -1
+        self.lock = threading.Lock()
+
+
+class RequestSequencer:
+    def __init__(self, max_entries=MAX_SEQUENCES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._sequences = OrderedDict()
+
+    def begin(self, key, seq):
+        # A kimenet sorába áll; None, ha közben újabb kérés érkezett (kihagyható)
+        with self._lock:
+            sequence = self._sequences.get(key)
+            if sequence is None:
+                sequence = self._sequences[key] = _Sequence()
+                if len(self._sequences) > self.max_entries:
+                    self._sequences.popitem(last=False)
+            else:
+                self._sequences.move_to_end(key)
+            if seq <= sequence.latest:
+                return None
+            sequence.latest = seq
+        sequence.lock.acquire()
+        if sequence.latest != seq:
+            sequence.lock.release()
+            return None
+        return sequence
+
+    @staticmethod
+    def end(sequence):
+        sequence.lock.release()
+
+
+request_sequencer = RequestSequencer()
+
+
+def _sequence_key():
+    # Csak a sorszámozott callback kérések; a háttér jobok lekérdezései (job, cacheKey) nem
+    if request.method != "POST" or not request.path.endswith("_dash-update-component"):
+        return None
+    if "job" in request.args or "cacheKey" in request.args:
+        return None
+    session = request.headers.get("X-Dash-Session")
+    try:
+        seq = int(request.headers.get("X-Dash-Seq", ""))
+    except ValueError:
+        return None
+    if not session:
+        return None
+    body = request.get_json(silent=True) or {}
+    return (session[:64], body.get("output", "unknown")), seq
+
+
+def register_request_sequencing(server):
+    if not SEQUENCING_ENABLED:
+        return
+
+    @server.before_request
+    def _sequence():
+        key = _sequence_key()
+        if key is None:
+            return None
+        (session, output), seq = key
+        try:
+            reported = int(request.headers.get("X-Dash-Superseded", 0))
+        except ValueError:
+            reported = 0
+        if reported > 0:
+            callback_metrics.inc(SUPERSEDED_METRIC, output, reported)
+        sequence = request_sequencer.begin((session, output), seq)
+        if sequence is None:
+            callback_metrics.inc(SUPERSEDED_METRIC, output)
+            return Response(status=204)
+        g.request_sequence = sequence
+        return None
+
+    @server.teardown_request
+    def _release(exc):
+        sequence = g.pop("request_sequence", None)
+        if sequence is not None:
+            RequestSequencer.end(sequence)
@@ -0,0 +1,171 @@
+import json
+import logging
+import os
+import threading
+import time
+
+# Gyors indulás: az app modul csak a Dash keretrendszert importálja, a pandas, a Plotly
+# Express, a pyarrow és a numpy az első használatkor töltődik be (függvényen belüli import).
+# CPI_FAST_START=1 esetén a worker az adatot és az első layoutot egy háttérszálon készíti
+# elő, így a /healthz már az import után válaszol; a közben érkező kérések a get_data()
+# betöltési zárján várnak a háttérszálra. Ilyenkor a Dash nem validálja a layout függvényt
+# importkor (suppress_callback_exceptions), mert az betöltené az adatot. Alapértelmezésben
+# a gunicorn master tölti be az adatot fork előtt (gunicorn.conf.py), ez a megosztott
+# memória miatt kedvezőbb. Ha a warm_up-ot semmi nem hívja (python app.py, gunicorn a
+# gunicorn.conf.py nélkül), az első /readyz kérés indítja el háttérszálon, így a /readyz
+# akkor is 200-ra vált, amikor az adat és az első layout elkészült.
+#
+# A fázisok ideje (másodperc) a /healthz és /readyz válaszában és a gunicorn logban látszik:
+#     boot        a folyamat indulásától a startup modul importjáig (interpreter, gunicorn)
+#     framework   Dash, Flask, komponens könyvtárak és a saját modulok
+#     app         az app modul többi része (callbackek, alapból a layout validálása az adattal)
+#     data        pandas import és az adatkészlet betöltése (gyors indulásnál háttérben)
+#     figures     Plotly Express import
+#     layout      az első layout felépítése
+#     first_response  a folyamat indulásától az első kiszolgált válaszig
+#
+# Mérés: 1 mag, Python 3.11, Dash 4, pandas 3, npy cache; a gunicorn indításától az első
+# 200-as /healthz válaszig, illetve a /readyz 200-ig (minden adat és layout kész):
+#
+#     beállítás                       /healthz   /readyz
+#     1 worker, alapértelmezés         1.8 s      1.8 s
+#     1 worker, CPI_FAST_START=1       0.88 s     1.8 s
+#     3 worker, CPI_FAST_START=1       0.99 s     3.9 s   (a workerek egy magon osztoznak)
+FAST_START = os.environ.get("CPI_FAST_START", "0") == "1"
+
+logger = logging.getLogger(__name__)
+
+
+def _process_age():
+    # A folyamat kora másodpercben (Linuxon /proc alapján, máshol 0)
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+class StartupTimer:
+    def __init__(self):
+        # A startup modult importáljuk elsőként: ami eddig tartott, az a boot fázis
+        age = _process_age()
+        self._last = time.perf_counter()
+        self.started = self._last - age
+        self.phases = {"boot": round(age, 4)}
+        # Az előkészítendő layout függvény (register_startup adja meg)
+        self.layout = None
+        self.ready = threading.Event()
+        # Elindult-e már az előkészítés (warm_up), hogy a /readyz ne indítsa újra
+        self.warming = False
+        self._lock = threading.Lock()
+
+    def mark(self, name):
+        # A fő szál egymást követő fázisai: az előző jelölés óta eltelt idő
+        now = time.perf_counter()
+        with self._lock:
+            self.phases[name] = round(now - self._last, 4)
+            self._last = now
+
+    def begin_warm_up(self):
+        # True, ha még senki nem indította el az előkészítést
+        with self._lock:
+            first = not self.warming
+            self.warming = True
+            return first
+
+    def timed(self, name, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.phases[name] = round(time.perf_counter() - start, 4)
+
+    def first_response(self):
+        if "first_response" not in self.phases:
+            with self._lock:
+                self.phases.setdefault("first_response", round(time.perf_counter() - self.started, 4))
+
+    def report(self):
+        with self._lock:
+            return dict(self.phases)
+
+
+startup_timer = StartupTimer()
+
+
+def _import_figures():
+    import plotly.express  # noqa: F401
+
+
+def _warm_up(log):
+    from cpidata import get_data
+
+    try:
+        startup_timer.timed("data", get_data)
+        startup_timer.timed("figures", _import_figures)
+        if startup_timer.layout is not None:
+            startup_timer.timed("layout", startup_timer.layout)
+    except Exception:
+        logger.exception("Warm-up failed, data is loaded on the first request")
+    startup_timer.ready.set()
+    log("Startup phases (s): %s", startup_timer.report())
+
+
+def warm_up(background=False, log=logger.info):
+    # Adat, Plotly Express és az első layout előkészítése (gunicorn.conf.py hívja:
+    # alapból a masterben fork előtt, gyors indulásnál a workerben háttérszálon)
+    startup_timer.begin_warm_up()
+    if not background:
+        _warm_up(log)
+        return None
+    thread = threading.Thread(target=_warm_up, args=(log,), name="cpi-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def _ensure_warm_up():
+    # A gunicorn.conf.py nélküli indításnál (python app.py, gunicorn -c nélkül) senki nem hívja
+    # a warm_up-ot: ilyenkor az első /readyz indítja háttérszálon, a kész állapotot a szál jelzi
+    if startup_timer.begin_warm_up():
+        warm_up(background=True)
+
+
+class HealthMiddleware:
+    # A /healthz és /readyz a Flask/Dash előtt válaszol: a Dash az első kérésnél
+    # (_setup_server) lefuttatja a layout függvényt, ami megvárná az adat betöltését
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if path == "/healthz":
+            # Élő-e a worker: az adat betöltését nem várja meg
+            return self._respond(start_response, "200 OK", status="ok")
+        if path == "/readyz":
+            ready = startup_timer.ready.is_set()
+            if not ready:
+                _ensure_warm_up()
+            return self._respond(start_response, "200 OK" if ready else "503 Service Unavailable")
+        try:
+            return self.wsgi_app(environ, start_response)
+        finally:
+            startup_timer.first_response()
+
+    def _respond(self, start_response, http_status, **extra):
+        body = json.dumps(dict(extra, ready=startup_timer.ready.is_set(), startup=startup_timer.report())).encode()
+        startup_timer.first_response()
+        start_response(http_status, [
+            ("Content-Type", "application/json"),
+            ("Content-Length", str(len(body))),
+            ("Cache-Control", "no-store"),
+        ])
+        return [body]
+
+
+def register_startup(server, layout=None):
+    startup_timer.layout = layout
+    server.wsgi_app = HealthMiddleware(server.wsgi_app)